@@ -0,0 +1,89 @@
+"""
+    benchmark.py
+    ~~~~
+    Tool to compare wall time of pipeline backends on the same PGN file
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import List, Tuple
+
+from egtb import BACKENDS, gil_enabled
+
+
+def run_backend(
+    path: Path, backend: str, options: List[str]
+) -> Tuple[float, dict]:
+    """
+    Analyse PGN file once with `egtb.py` in a separate interpreter.
+    Return wall time and resulting statistics.
+
+    :param path: PGN file
+    :param backend: pipeline backend, one of BACKENDS
+    :param options: other `egtb.py` options
+    """
+    egtb_script = Path(__file__).with_name('egtb.py')
+    cmd = [sys.executable, str(egtb_script), str(path), '--backend', backend]
+    started = time.perf_counter()
+    subprocess.run([*cmd, *options], check=True, stdout=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - started
+
+    with open(path.with_suffix('.stats.json')) as f:
+        stats = json.load(f)
+    return elapsed, stats
+
+
+def main():
+    ap = ArgumentParser(
+        description=(
+            'Time egtb.py with every backend on the same file. '
+            'Unknown options are passed to egtb.py'
+        )
+    )
+    ap.add_argument('path', type=Path, help='PGN file to analyse')
+    ap.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='Number of runs per backend. Default: 3',
+    )
+    args, options = ap.parse_known_args()
+
+    if gil_enabled():
+        print(
+            'GIL is enabled: threads backend falls back to processes. '
+            'Run with free-threaded Python (3.13t+) to compare them'
+        )
+
+    times, stats = {}, {}
+    for backend in BACKENDS:
+        times[backend] = []
+        for _ in range(args.repeat):
+            elapsed, stats[backend] = run_backend(args.path, backend, options)
+            times[backend].append(elapsed)
+
+    reference = times['processes']
+    print('|Backend|Best, s|Median, s|Speedup (median)|')
+    print('|:----:|:----:|:----:|:----:|')
+    for backend, runs in times.items():
+        speedup = statistics.median(reference) / statistics.median(runs)
+        print(
+            f'|{backend}'
+            f'|{min(runs):.2f}'
+            f'|{statistics.median(runs):.2f}'
+            f'|{speedup:.2f}x|'
+        )
+
+    # Backends must only differ in speed
+    if len({json.dumps(s, sort_keys=True) for s in stats.values()}) != 1:
+        print('Backends produced different statistics')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,9 +3,16 @@ import io
 import json
 import logging
 import multiprocessing as mp
+import os
+import queue
+import re
+import signal
 import sys
+import threading
+import time
 from argparse import ArgumentParser
-from collections import Counter, defaultdict
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import Executor
 from datetime import datetime as dt
 from itertools import count
 from pathlib import Path
@@ -15,13 +22,21 @@ from typing import (
     Iterable,
     Iterator,
     List,
+    NamedTuple,
     Optional,
+    Sequence,
     Tuple,
     Union,
 )
 
 import chess.pgn
 
+import profiling
+import remote
+import replay
+from positions import PositionStore, encode_position
+from rollup import Rollup
+
 logging.getLogger("chess.pgn").setLevel(logging.CRITICAL)
 
 # ---- Constants and shared values ----
@@ -39,6 +54,68 @@ EGTB_PIECE_ORDER = {
     'P': 5,
 }
 
+# Pipeline backends: stage workers, queue for games and queue for results.
+# Results queue is synchronous so a worker that dies
+# can't take already analysed games with it
+BACKENDS = {
+    'processes': (mp.Process, mp.Queue, mp.SimpleQueue),
+    'threads': (threading.Thread, queue.Queue, queue.SimpleQueue),
+}
+
+# Default CPU time budget for analysis of a single game, seconds
+GAME_CPU_BUDGET = 10.0
+
+# A worker that spends this many budgets (wall time) on a single game
+# is considered hung and gets restarted
+HUNG_WORKER_FACTOR = 10
+
+# How often supervisor checks the workers, seconds
+SUPERVISE_INTERVAL = 1.0
+
+# Max number of games handed to an analysis worker ahead of time
+WORKER_QUEUE_SIZE = 20
+
+# How often dispatcher checks for room when all workers are busy, seconds
+DISPATCH_POLL_INTERVAL = 0.01
+
+# Results queue message for a game that couldn't be analysed
+QUARANTINE = 'QUARANTINE'
+
+# Results queue message with replay cache counters of a worker
+REPLAY_CACHE = 'REPLAY_CACHE'
+
+# Results queue message with a reached position to store
+# from an analysis thread that counts games itself
+POSITION = 'POSITION'
+
+# Parser (and results queue) message for input that couldn't be read
+# to the end; statistics of such input are incomplete and aren't saved
+PARSE_FAILED = 'PARSE_FAILED'
+
+# Default number of opening snapshots kept by each analysis worker
+REPLAY_CACHE_SIZE = 10_000
+
+# Half-moves after which board snapshots are cached
+SNAPSHOT_PLIES = (4, 8, 12, 16, 20, 24)
+
+# Movetext tokens: comments, NAGs, variation brackets,
+# move numbers and everything else (SAN moves and game results)
+MOVETEXT_TOKEN_REGEX = re.compile(
+    r'\{[^}]*\}|;.*|\$\d+|[()]|\d+\.+|[^\s(){};]+'
+)
+GAME_RESULTS = {'1-0', '0-1', '1/2-1/2', '*'}
+
+# Follow mode: how often to check a PGN file for new games, seconds
+FOLLOW_POLL_INTERVAL = 1.0
+
+# Follow mode: how often to rewrite the stats snapshot, seconds
+SNAPSHOT_INTERVAL = 10.0
+
+# Game date headers, most precise first, and the year/month of their value;
+# unknown parts of the date are written as `??`
+GAME_DATE_TAGS = ('[UTCDate "', '[Date "')
+GAME_MONTH_REGEX = re.compile(r'(\d{4})\.(0[1-9]|1[0-2])\.')
+
 # ---- End of: Constants and shared values ----
 
 
@@ -81,6 +158,29 @@ def next_pgn(fiter: Iterator) -> List[str]:
         return pgn
 
 
+def follow_lines(f, poll: float = FOLLOW_POLL_INTERVAL) -> Iterator[str]:
+    """
+    Iterate over lines of a file that is still being written, forever.
+    Only complete lines are returned: a partially written line
+    is held back until its end is appended.
+
+    :param f: file opened in text mode
+    :param poll: how long to wait at EOF before reading again, seconds
+    """
+    partial = ''
+    while True:
+        line = f.readline()
+        if not line:
+            # EOF for now; the file keeps its position
+            time.sleep(poll)
+            continue
+
+        partial += line
+        if partial.endswith('\n'):
+            yield partial
+            partial = ''
+
+
 def get_line(
     predicate: Callable[[str], bool], iterable: Union[Iterable, Iterator]
 ):
@@ -185,6 +285,67 @@ def get_time_control(pgn: List[str]) -> str:
         return 'slow'
 
 
+def get_game_month(pgn: List[str]) -> Optional[str]:
+    """
+    Determine month (YYYY-MM) the 1-game PGN was played in.
+    UTCDate is preferred over Date; None if the month is unknown.
+
+    :param pgn: list with parsed PGN
+    """
+    for tag in GAME_DATE_TAGS:
+        line = next((x for x in pgn if x.startswith(tag)), None)
+        if line is None:
+            continue
+        match = GAME_MONTH_REGEX.match(line, len(tag))
+        if match is not None:
+            return f'{match.group(1)}-{match.group(2)}'
+    return None
+
+
+def eligible_time_control(
+    pgn: List[str], loelo: int, hielo: int, exclude: Iterable[str]
+) -> Optional[str]:
+    """
+    Get time control of the game if it's eligible for analysis.
+
+    :param pgn: list with parsed PGN
+    :param loelo: lower ELO threshold
+    :param hielo: higher ELO threshold
+    :param exclude: time controls to exclude
+    """
+    # Check the game for ELO range
+    # Skip abandoned games
+    # Skip excluded time control types
+    if is_abandoned(pgn):
+        return None
+    if not is_in_elo_range(pgn, loelo, hielo):
+        return None
+
+    tc = get_time_control(pgn)
+    if tc in exclude:
+        return None
+    return tc
+
+
+def open_pgn(filepath: Path):
+    """
+    Open (compressed) PGN file for reading in text mode.
+
+    :param filepath: path to (compressed) PGN file
+    """
+    # Check path suffix to determine how to read the file
+    suffix = filepath.suffix
+    if suffix == '.bz2':
+        openfunc, mode = bz2.open, 'rt'
+    # Leave the ability to operate on single unpacked PGN file
+    elif suffix == '.pgn':
+        openfunc, mode = open, 'r'
+    else:
+        raise RuntimeError(f'Unsupported extension: {suffix}')
+
+    return openfunc(filepath, mode, encoding='latin-1')
+
+
 def parse_compressed_pgn(
     filepath: Path,
     queue: mp.Queue,
@@ -192,6 +353,9 @@ def parse_compressed_pgn(
     hielo: int,
     exclude: List[str],
     workers: int,
+    follow: bool = False,
+    url: Optional[str] = None,
+    read_ahead: int = remote.READ_AHEAD,
 ):
     """
     Extract games that fall into [loelo:hielo] range from (compressed) PGN.
@@ -202,47 +366,50 @@ def parse_compressed_pgn(
     :param hielo: higher ELO threshold
     :param exclude: list with time controls to exclude
     :param workers: number of workers that will consume the queue
+    :param follow: keep reading new games appended to uncompressed PGN
+    :param url: stream PGN from this URL instead of reading `filepath`
+    :param read_ahead: size of the read-ahead buffer for URLs, bytes
     """
-    # Check path suffix to determine how to read the file
-    suffix = filepath.suffix
-    if suffix == '.bz2':
-        openfunc, mode = bz2.open, 'rt'
-    # Leave the ability to operate on single unpacked PGN file
-    elif suffix == '.pgn':
-        openfunc, mode = open, 'r'
-    else:
-        raise RuntimeError(f'Unsupported extension: {suffix}')
-
     game_counter = count(1)
     # Process file
-    with openfunc(filepath, mode, encoding='latin-1') as f:
-        while True:
-            try:
-                pgn = next_pgn(f)
-                sys.stdout.write(f'Processed game #{next(game_counter):,}\r')
-            except StopIteration:
-                # EOF
-                break
-
-            # Check the game for ELO range
-            # Skip abandoned games
-            # Skip excluded time control types
-            if is_abandoned(pgn):
-                continue
-            if not is_in_elo_range(pgn, loelo, hielo):
-                continue
-
-            tc = get_time_control(pgn)
-            if tc in exclude:
-                continue
-
-            # Save game for processing
-            queue.put((pgn, tc))
+    try:
+        if follow and filepath.suffix != '.pgn':
+            raise RuntimeError('Follow mode requires uncompressed PGN')
 
-    # Finished file processing
-    # Notify all workers by putting in DONE message for each
-    for _ in range(workers):
-        queue.put('DONE')
+        if url is None:
+            pgn_file = open_pgn(filepath)
+        else:
+            pgn_file = remote.open_url(url, read_ahead)
+
+        with pgn_file as f:
+            # In follow mode, waiting for new games happens inside
+            # the line iterator, so the parsing below never sees EOF
+            lines = follow_lines(f) if follow else f
+            while True:
+                try:
+                    pgn = next_pgn(lines)
+                    # Game number doubles as game offset in the file
+                    game_no = next(game_counter)
+                    sys.stdout.write(f'Processed game #{game_no:,}\r')
+                except StopIteration:
+                    # EOF
+                    break
+
+                tc = eligible_time_control(pgn, loelo, hielo, exclude)
+                if tc is None:
+                    continue
+
+                # Save game for processing
+                queue.put((game_no, pgn, tc))
+    except Exception as e:
+        # E.g. download failed for good or corrupted archive
+        queue.put((PARSE_FAILED, f'{e!r}'))
+    finally:
+        # Finished file processing, or reading failed for good:
+        # notify all workers by putting in DONE message for each,
+        # so the pipeline doesn't wait for games that never come
+        for _ in range(workers):
+            queue.put('DONE')
 
 
 # ---- End of: DB files parsing routines ----
@@ -274,10 +441,200 @@ def egtb_name_from_pieces(pieces: Tuple[str]) -> str:
         return f'{black}v{white}'
 
 
-def play_game(pgn: str, captures: int) -> Optional[str]:
+def mainline_san(movetext: str) -> List[str]:
+    """
+    Extract mainline SAN moves from PGN movetext.
+    Raise ValueError for games with variations: python-chess validates
+    those as well, so they are left to its PGN parser.
+
+    :param movetext: game log with move numbers, comments etc.
+    """
+    moves = []
+    for token in MOVETEXT_TOKEN_REGEX.findall(movetext):
+        if token in '()':
+            raise ValueError('variations in movetext')
+        elif token[0] in '{;$' or token[-1] == '.':
+            # Comment, NAG or move number
+            continue
+        elif token not in GAME_RESULTS:
+            # Move suffix annotations (e.g. `e4!?`) aren't part of SAN
+            moves.append(token.rstrip('!?'))
+    return moves
+
+
+class ReplayCache:
+    """
+    Bounded LRU cache of board snapshots keyed by the mainline
+    opening prefix. Snapshots are taken after `SNAPSHOT_PLIES` half-moves.
+    """
+
+    def __init__(self, maxsize: int = REPLAY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._boards = OrderedDict()
+
+    def resume(self, moves: List[str]) -> Tuple[chess.Board, int]:
+        """
+        Get the board after the deepest cached prefix of `moves`
+        and the number of half-moves it covers.
+
+        :param moves: mainline SAN moves
+        """
+        for ply in reversed(SNAPSHOT_PLIES):
+            if ply > len(moves):
+                continue
+            board = self._boards.get(tuple(moves[:ply]))
+            if board is not None:
+                self._boards.move_to_end(tuple(moves[:ply]))
+                self.hits += 1
+                return board.copy(stack=False), ply
+
+        self.misses += 1
+        return chess.Board(), 0
+
+    def store(self, moves: List[str], ply: int, board: chess.Board):
+        """
+        Save board snapshot after `ply` half-moves.
+
+        :param moves: mainline SAN moves
+        :param ply: number of half-moves played on the board
+        :param board: board to save
+        """
+        key = tuple(moves[:ply])
+        if key in self._boards:
+            return
+        self._boards[key] = board.copy(stack=False)
+        if len(self._boards) > self.maxsize:
+            self._boards.popitem(last=False)
+            self.evictions += 1
+
+
+def replay_with_cache(
+    pgn: List[str], captures: int, cache: ReplayCache
+) -> Optional[chess.Board]:
+    """
+    Same as `chess_reach_position`, but start from the deepest
+    cached opening snapshot instead of the initial position.
+    Raise ValueError on any move python-chess can't play.
+
+    :param pgn: PGN to analyze
+    :param captures: number of captures to reach
+    :param cache: opening snapshots cache
+    """
+    moves = mainline_san(pgn[-1])
+    board, start = cache.resume(moves)
+    target = 32 - captures
+    reached, reached_ply, trivialised = None, 0, False
+
+    # All moves are played, like `chess.pgn.read_game` does,
+    # so games with illegal moves are caught as well
+    for ply in range(start + 1, len(moves) + 1):
+        board.push_san(moves[ply - 1])
+        if ply in SNAPSHOT_PLIES:
+            cache.store(moves, ply, board)
+
+        pieces = chess.popcount(board.occupied)
+        if reached is None:
+            # See `chess_reach_position` for `captures` + 2
+            if ply >= captures + 2 and pieces == target:
+                reached, reached_ply = board.copy(stack=False), ply
+        elif ply == reached_ply + 1:
+            trivialised = pieces < target
+
+    if reached is None or reached_ply == len(moves) or trivialised:
+        return None
+    return reached
+
+
+def fast_replay(pgn: List[str], captures: int) -> Optional[chess.Board]:
+    """
+    Same as `chess_reach_position`, but with the non-validating engine.
+    Raise ValueError if the engine can't resolve some move.
+
+    :param pgn: PGN to analyze
+    :param captures: number of captures to reach
+    """
+    reached = replay.reach_position(mainline_san(pgn[-1]), captures)
+    if reached is None:
+        return None
+
+    pieces, white_to_move = reached
+    board = chess.Board(None)
+    board.set_piece_map(
+        {sq: chess.Piece.from_symbol(p) for sq, p in pieces.items()}
+    )
+    board.turn = white_to_move
+    return board
+
+
+def is_standard_game(pgn: List[str]) -> bool:
+    """
+    Check if game starts from the standard initial position.
+
+    :param pgn: list with parsed PGN
+    """
+    return not any(line.startswith(('[FEN ', '[Variant ')) for line in pgn)
+
+
+def quick_reach_position(
+    pgn: List[str],
+    captures: int,
+    cache: Optional[ReplayCache],
+    fast: bool,
+) -> Optional[chess.Board]:
+    """
+    Reach position with the fast engine or from cached opening snapshots,
+    whichever is enabled (fast engine is tried first).
+    Raise ValueError if neither could replay the game.
+
+    :param pgn: PGN to analyze
+    :param captures: number of captures to reach
+    :param cache: opening snapshots cache to resume replay from
+    :param fast: try non-validating replay engine
+    """
+    if fast:
+        try:
+            return fast_replay(pgn, captures)
+        except ValueError:
+            if cache is None:
+                raise
+
+    return replay_with_cache(pgn, captures, cache)
+
+
+def reach_position(
+    pgn: str,
+    captures: int,
+    cache: Optional[ReplayCache] = None,
+    fast: bool = False,
+) -> Optional[chess.Board]:
     """
     Process PGN with a move generator to reach needed position.
-    Determine EGTB to use based on the pieces left.
+    Return the board in this position if it's suitable for statistics.
+
+    :param pgn: PGN to analyze
+    :param captures: number of captures to reach
+    :param cache: opening snapshots cache to resume replay from
+    :param fast: try non-validating replay engine first
+    """
+    # Fast engine and snapshots only work for games from the initial position
+    if (fast or cache is not None) and is_standard_game(pgn):
+        try:
+            return quick_reach_position(pgn, captures, cache, fast)
+        except ValueError:
+            # Let python-chess decide on games with illegal, ambiguous
+            # or unusual moves
+            pass
+
+    return chess_reach_position(pgn, captures)
+
+
+def chess_reach_position(pgn: str, captures: int) -> Optional[chess.Board]:
+    """
+    Replay the game with python-chess PGN parser to reach needed position.
+    Return the board in this position if it's suitable for statistics.
 
     :param pgn: PGN to analyze
     :param captures: number of captures to reach
@@ -315,6 +672,19 @@ def play_game(pgn: str, captures: int) -> Optional[str]:
         # if game is invalid, exclude it from analysis
         return None
 
+    return keep_if_not_trivialised(board, mainline)
+
+
+def keep_if_not_trivialised(
+    board: chess.Board, mainline: Iterator[chess.Move]
+) -> Optional[chess.Board]:
+    """
+    Return the board if the reached position is suitable for statistics,
+    i.e. the game goes on and the next half-move isn't a capture.
+
+    :param board: board in the reached position
+    :param mainline: iterator over the rest of mainline moves
+    """
     # Save current piece composition and make another half-move.
     # If the next half-move reduces the number of pieces on the board,
     # consider this position as being “trivialised” by a lower-order EGTB.
@@ -333,85 +703,601 @@ def play_game(pgn: str, captures: int) -> Optional[str]:
         # Consider this position as one that can be trivialised
         return None
 
-    # Position is sutable for statistics
-    return egtb_name_from_pieces(reached)
+    # Position is sutable for statistics; go back to it
+    board.pop()
+    return board
+
+
+def play_game(pgn: str, captures: int) -> Optional[str]:
+    """
+    Determine EGTB to use based on the pieces left
+    in the position reached after `captures` number of captures.
+
+    :param pgn: PGN to analyze
+    :param captures: number of captures to reach
+    """
+    board = reach_position(pgn, captures)
+    if board is None:
+        return None
+
+    return egtb_name_from_pieces(
+        tuple(p.symbol() for p in board.piece_map().values())
+    )
+
+
+class GameTimeout(Exception):
+    """
+    Game analysis exceeded CPU time budget.
+    """
+
+
+def _raise_game_timeout(signum, frame):
+    raise GameTimeout
+
+
+class WorkerSlots:
+    """
+    State of analysis workers shared with the supervisor.
+
+    For each worker, `game` holds the number of the game being analysed
+    (or one of the state constants below), `started` holds
+    the time when its analysis started and `taken` holds the number
+    of the last game taken from the input queue.
+    """
+
+    IDLE = 0
+    GOT_DONE = -1
+    SENT_DONE = -2
+
+    def __init__(self, workers: int):
+        self.game = mp.RawArray('q', workers)
+        self.started = mp.RawArray('d', workers)
+        self.taken = mp.RawArray('q', workers)
+
+
+class ThreadCounts:
+    """
+    Statistics counted by an analysis thread itself (threads backend),
+    so analysed games don't go through the results queue:
+    only reached positions do, to keep a single writer of the store.
+    The collector adds counts of all threads to its own ones.
+    Counts outlive the thread, so a restarted one continues them.
+    """
+
+    def __init__(self):
+        self.timecontrol = defaultdict(int)
+        self.egtb = defaultdict(int)
+        self.monthly = defaultdict(
+            lambda: (defaultdict(int), defaultdict(int))
+        )
+        # Guards counts from snapshots taken while the thread runs
+        self.lock = threading.Lock()
+
+    def add(self, tc: str, egtb: str, month: Optional[str]):
+        """
+        Count analysed game.
+
+        :param tc: time control
+        :param egtb: EGTB name
+        :param month: game month or None
+        """
+        count_result(
+            (tc, egtb, None, month),
+            self.timecontrol,
+            self.egtb,
+            self.monthly,
+            self.lock,
+            None,
+        )
+
+
+def budgeted_reach_position(
+    pgn: List[str],
+    captures: int,
+    budget: float,
+    cache: Optional[ReplayCache] = None,
+    fast: bool = False,
+) -> Optional[chess.Board]:
+    """
+    Call `reach_position` with a CPU time limit.
+    Raise GameTimeout if the limit is exceeded.
+
+    :param pgn: PGN to analyze
+    :param captures: number of captures to reach
+    :param budget: CPU time budget, seconds; 0 disables the limit
+    :param cache: opening snapshots cache to resume replay from
+    :param fast: try non-validating replay engine first
+    """
+    # Interval timers and signal handlers only work in the main thread
+    in_main_thread = threading.current_thread() is threading.main_thread()
+    can_limit = hasattr(signal, 'setitimer') and in_main_thread
+    if not budget or not can_limit:
+        return reach_position(pgn, captures, cache, fast)
+
+    # ITIMER_PROF counts CPU time of the process;
+    # each worker process analyses one game at a time
+    signal.signal(signal.SIGPROF, _raise_game_timeout)
+    signal.setitimer(signal.ITIMER_PROF, budget)
+    try:
+        return reach_position(pgn, captures, cache, fast)
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+
+
+def record_replay_time(
+    replay_times: profiling.ReplayTimes, pgn: List[str], seconds: float
+):
+    """
+    Add game replay time to the histogram
+    by game length and number of captures.
+
+    :param replay_times: replay-time histogram
+    :param pgn: analysed PGN
+    :param seconds: replay time
+    """
+    try:
+        moves = mainline_san(pgn[-1])
+    except ValueError:
+        # Games with variations are rare; leave them out
+        return
+    replay_times.add(len(moves), sum('x' in m for m in moves), seconds)
+
+
+def describe_position(
+    board: chess.Board, store_positions: bool
+) -> Tuple[str, Optional[bytes]]:
+    """
+    Get EGTB name for the reached position
+    and packed position itself (if needed).
+
+    :param board: board in the reached position
+    :param store_positions: pack the position
+    """
+    pieces = {sq: p.symbol() for sq, p in board.piece_map().items()}
+    egtb = egtb_name_from_pieces(tuple(pieces.values()))
+
+    position = None
+    if store_positions:
+        position = encode_position(pieces, board.turn == chess.WHITE)
+    return egtb, position
+
+
+def report_worker_stats(
+    out_queue: mp.Queue,
+    cache: Optional[ReplayCache],
+    replay_times: Optional[profiling.ReplayTimes],
+    profile_dir: Optional[Path],
+):
+    """
+    Send replay cache counters to the collector
+    and save replay-time histogram when analysis worker finishes.
+
+    :param out_queue: queue for analysis results
+    :param cache: opening snapshots cache, if used
+    :param replay_times: replay-time histogram, if profiling
+    :param profile_dir: folder for profiles
+    """
+    if cache is not None:
+        out_queue.put(
+            (REPLAY_CACHE, cache.hits, cache.misses, cache.evictions)
+        )
+    if replay_times is not None:
+        replay_times.dump(profile_dir)
+
+
+def send_result(
+    out_queue: mp.Queue,
+    counts: Optional[ThreadCounts],
+    tc: str,
+    egtb: str,
+    position: Optional[bytes],
+    month: Optional[str],
+):
+    """
+    Send time control, EGTB name, packed position (if needed)
+    and game month to statistics queue.
+    An analysis thread counts the game itself
+    and only sends the position, if it's stored.
+
+    :param out_queue: queue for analysis results
+    :param counts: statistics of the analysis thread, if it counts games
+    :param tc: time control
+    :param egtb: EGTB name
+    :param position: packed position or None
+    :param month: game month or None
+    """
+    if counts is None:
+        out_queue.put((tc, egtb, position, month))
+        return
+
+    counts.add(tc, egtb, month)
+    if position is not None:
+        out_queue.put((POSITION, egtb, position))
 
 
 def analyse_game(
     in_queue: mp.Queue,
     out_queue: mp.Queue,
     captures: int,
+    store_positions: bool = False,
+    slots: Optional[WorkerSlots] = None,
+    slot: int = 0,
+    budget: float = 0.0,
+    cache_size: int = 0,
+    fast_replay: bool = False,
+    profile_dir: Optional[Path] = None,
+    counts: Optional[ThreadCounts] = None,
 ):
     """
     Analyse games in PGN queue.
     Determine the ones that reach (non-trivial) 7-man position
     and find out the EGTB that will be used to analyse this position.
+    Games that fail or exceed the CPU budget are sent for quarantine.
 
     :param in_queue: queue with PGNs
     :param out_queue: queue for analysis results
     :param captures: number of captures to reach
+    :param store_positions: also send packed reached positions
+    :param slots: shared workers state for supervision
+    :param slot: index of this worker in `slots`
+    :param budget: CPU time budget per game, seconds; 0 disables the limit
+    :param cache_size: number of cached opening snapshots; 0 disables cache
+    :param fast_replay: use non-validating replay engine for clean games
+    :param profile_dir: folder to save replay-time histogram to
+    :param counts: count games here instead of sending them
+        to the results queue (threads backend)
     """
-    pair = None
+    if slots is None:
+        slots = WorkerSlots(1)
+    cache = ReplayCache(cache_size) if cache_size else None
+    replay_times = profiling.ReplayTimes() if profile_dir else None
+
+    item = None
     while True:
-        pair = in_queue.get()
-        if pair == 'DONE':
+        item = in_queue.get()
+        if item == 'DONE':
             # End of input queue
+            slots.game[slot] = WorkerSlots.GOT_DONE
             break
-        pgn, tc = pair
+        game_no, pgn, tc = item
 
-        # Pass the SAN to move generator to determine EGTB name
-        # for the position after `captures` number of captures
-        egtb = play_game(pgn, captures)
-        if egtb is None:
+        slots.taken[slot] = game_no
+        slots.started[slot] = time.time()
+        slots.game[slot] = game_no
+        started = time.perf_counter()
+
+        # Pass the SAN to move generator to reach the position
+        # after `captures` number of captures
+        try:
+            board = budgeted_reach_position(
+                pgn, captures, budget, cache, fast_replay
+            )
+        except GameTimeout:
+            out_queue.put((QUARANTINE, game_no, pgn, 'CPU budget exceeded'))
+            continue
+        except Exception as e:
+            # Malformed game that python-chess couldn't handle
+            out_queue.put((QUARANTINE, game_no, pgn, f'error: {e!r}'))
+            continue
+        finally:
+            slots.game[slot] = WorkerSlots.IDLE
+
+        if replay_times is not None:
+            record_replay_time(
+                replay_times, pgn, time.perf_counter() - started
+            )
+
+        if board is None:
             # EGTB was trivialised or unsuitable.
             # Get next game to analyse.
             continue
 
-        # Send EGTB name and time control
-        # to statistics queue
-        out_queue.put((tc, egtb))
+        egtb, position = describe_position(board, store_positions)
+        send_result(
+            out_queue, counts, tc, egtb, position, get_game_month(pgn)
+        )
+
+    report_worker_stats(out_queue, cache, replay_times, profile_dir)
 
     # Worker finished processing games in queue.
     # Put the DONE message in the results queue
     # to signal result processing worker that
     # this worker has ended processing.
     out_queue.put('DONE')
+    slots.game[slot] = WorkerSlots.SENT_DONE
 
 
 # ---- End of: Game analysis routines ----
 
 # ---- Statistics and multiprocessing routines ----
-def collect_results(filepath: Path, queue: mp.Queue, workers: int):
+def stats_dict(timecontrol: dict, egtb: dict) -> dict:
+    """
+    Statistics in the layout of `.stats.json` files.
+
+    :param timecontrol: number of games per time control
+    :param egtb: number of games per EGTB
+    """
+    # collections.Counter is used to put the most frequent EGTB names first
+    return {
+        'timecontrol': dict(timecontrol),
+        'EGTB': dict(Counter(egtb).most_common()),
+    }
+
+
+def write_stats(
+    filepath: Path,
+    timecontrol: dict,
+    egtb: dict,
+    monthly: Optional[Dict[str, Tuple[dict, dict]]] = None,
+):
+    """
+    Save statistics for a PGN file to JSON.
+    File is replaced atomically so readers never see a partial one.
+
+    :param filepath: path to PGN file; used for choosing JSON name
+    :param timecontrol: number of games per time control
+    :param egtb: number of games per EGTB
+    :param monthly: game month to (time control, EGTB) counts
+        for games with known date
+    """
+    stats = stats_dict(timecontrol, egtb)
+    if monthly:
+        # Buckets for date-range queries, see rollup.py
+        stats['months'] = {
+            month: stats_dict(*monthly[month]) for month in sorted(monthly)
+        }
+
+    statsfile = filepath.with_suffix('.stats.json')
+    tmpfile = statsfile.with_name(statsfile.name + '.tmp')
+    with open(tmpfile, 'w') as f:
+        json.dump(stats, f)
+    os.replace(tmpfile, statsfile)
+
+
+def add_counts(total: Dict[str, int], counts: Dict[str, int]):
+    """
+    Add counts to totals by key.
+
+    :param total: totals to update
+    :param counts: counts to add
+    """
+    for k, v in counts.items():
+        total[k] += v
+
+
+def gather_stats(
+    timecontrol: dict,
+    egtb: dict,
+    monthly: dict,
+    lock: threading.Lock,
+    thread_counts: Sequence[ThreadCounts],
+) -> Tuple[dict, dict, dict]:
+    """
+    Copy statistics of the collector together with counts
+    of analysis threads. Return time control, EGTB and per-month counts.
+
+    :param timecontrol: number of games per time control
+    :param egtb: number of games per EGTB
+    :param monthly: game month to (time control, EGTB) counts
+    :param lock: lock guarding `timecontrol`, `egtb` and `monthly`
+    :param thread_counts: statistics counted by analysis threads
+    """
+    tc_all, egtb_all = defaultdict(int), defaultdict(int)
+    monthly_all = defaultdict(lambda: (defaultdict(int), defaultdict(int)))
+
+    sources = [(timecontrol, egtb, monthly, lock)]
+    for c in thread_counts:
+        sources.append((c.timecontrol, c.egtb, c.monthly, c.lock))
+
+    for tc_src, egtb_src, monthly_src, src_lock in sources:
+        with src_lock:
+            add_counts(tc_all, tc_src)
+            add_counts(egtb_all, egtb_src)
+            for month, (tc, eg) in monthly_src.items():
+                add_counts(monthly_all[month][0], tc)
+                add_counts(monthly_all[month][1], eg)
+
+    return tc_all, egtb_all, monthly_all
+
+
+def snapshot_stats(
+    filepath: Path,
+    timecontrol: dict,
+    egtb: dict,
+    monthly: dict,
+    quarantined: List[tuple],
+    lock: threading.Lock,
+    stop: threading.Event,
+    interval: float,
+    thread_counts: Sequence[ThreadCounts] = (),
+):
+    """
+    Periodically save statistics and quarantined games gathered so far
+    until stopped.
+
+    :param filepath: path to PGN file; used for choosing JSON name
+    :param timecontrol: number of games per time control; updated by collector
+    :param egtb: number of games per EGTB; updated by collector
+    :param monthly: per-month counts; updated by collector
+    :param quarantined: list of (game number, PGN or None, reason);
+        updated by collector
+    :param lock: lock guarding `timecontrol`, `egtb`, `monthly`
+        and `quarantined`
+    :param stop: event to stop snapshots
+    :param interval: time between snapshots, seconds; 0 disables them
+    :param thread_counts: statistics counted by analysis threads
+    """
+    if not interval:
+        return
+
+    while not stop.wait(interval):
+        stats = gather_stats(timecontrol, egtb, monthly, lock, thread_counts)
+        with lock:
+            quarantined_copy = list(quarantined)
+        write_stats(filepath, *stats)
+        if quarantined_copy:
+            write_quarantine(filepath, quarantined_copy)
+
+
+def write_quarantine(filepath: Path, games: List[tuple]):
+    """
+    Save games that couldn't be analysed to a PGN file.
+    Each game is preceded by an escape line (`%`) with its number
+    in the source file and the reason.
+
+    :param filepath: path to PGN file; used for choosing quarantine name
+    :param games: list of (game number, PGN or None, reason)
+    """
+    with open(filepath.with_suffix('.quarantine.pgn'), 'w') as f:
+        for game_no, pgn, reason in sorted(games, key=lambda x: x[0]):
+            f.write(f'% game #{game_no}: {reason}\n')
+            if pgn is None:
+                # Worker died with this game; PGN is lost with it
+                f.write('\n')
+                continue
+            *header, san = pgn
+            f.write('\n'.join(header) + '\n\n' + san + '\n\n')
+
+
+def report_side_results(
+    filepath: Path, cache_stats: List[int], quarantined: List[tuple]
+):
+    """
+    Report replay cache counters and save quarantined games.
+
+    :param filepath: path to PGN file; used for choosing quarantine name
+    :param cache_stats: replay cache hits, misses and evictions
+    :param quarantined: list of (game number, PGN or None, reason)
+    """
+    if any(cache_stats):
+        hits, misses, evictions = cache_stats
+        print(
+            f'Replay cache: {hits / (hits + misses):.1%} hit rate, '
+            f'{evictions:,} evictions'
+        )
+
+    if quarantined:
+        print(f'Quarantined {len(quarantined)} games')
+        write_quarantine(filepath, quarantined)
+
+
+def count_result(
+    item: tuple,
+    timecontrol: dict,
+    egtb: dict,
+    monthly: dict,
+    lock: threading.Lock,
+    store: Optional[PositionStore],
+):
+    """
+    Add analysis result of one game to statistics.
+
+    :param item: tuple of (timecontrol, EGTB string,
+        packed position or None, game month or None)
+    :param timecontrol: number of games per time control
+    :param egtb: number of games per EGTB
+    :param monthly: game month to (time control, EGTB) counts
+    :param lock: lock guarding counts from snapshots
+    :param store: store for reached positions, if they are saved
+    """
+    tc, eg, position, month = item
+    with lock:
+        timecontrol[tc] += 1
+        egtb[eg] += 1
+        if month is not None:
+            monthly[month][0][tc] += 1
+            monthly[month][1][eg] += 1
+    if store is not None:
+        store.add(eg, position)
+
+
+def collect_results(
+    filepath: Path,
+    queue: mp.Queue,
+    workers: int,
+    store_positions: bool = False,
+    snapshot_interval: float = 0.0,
+    thread_counts: Sequence[ThreadCounts] = (),
+):
     """
     Process results queue and gather statistics.
 
     :param filepath: path to PGN file; used for choosing JSON name
     :param queue: results queue to process
     :param workers: number of workers; used to determine end-of-queue
+    :param store_positions: save reached positions next to JSON
+    :param snapshot_interval: save stats gathered so far this often, seconds;
+        0 disables snapshots
+    :param thread_counts: statistics counted by analysis threads;
+        added to the ones from the queue
     """
     cnt = 0
+    failed = None
     timecontrol, egtb = defaultdict(int), defaultdict(int)
+    # Game month -> (time control, EGTB) counts
+    monthly = defaultdict(lambda: (defaultdict(int), defaultdict(int)))
+    quarantined = []
+    # Replay cache hits, misses and evictions
+    cache_stats = [0, 0, 0]
+    store = (
+        PositionStore(filepath.with_suffix('.positions'))
+        if store_positions
+        else None
+    )
+
+    lock, stop = threading.Lock(), threading.Event()
+    snapshots = threading.Thread(
+        target=snapshot_stats,
+        args=(
+            filepath,
+            timecontrol,
+            egtb,
+            monthly,
+            quarantined,
+            lock,
+            stop,
+            snapshot_interval,
+            thread_counts,
+        ),
+        daemon=True,
+    )
+    snapshots.start()
 
     # Process queue until %workers% number of “DONE” are met
     while cnt != workers:
-        pair = queue.get()
-        if pair == 'DONE':
+        item = queue.get()
+        if item == 'DONE':
             cnt += 1
+        elif item[0] == QUARANTINE:
+            with lock:
+                quarantined.append(item[1:])
+        elif item[0] == REPLAY_CACHE:
+            cache_stats = [a + b for a, b in zip(cache_stats, item[1:])]
+        elif item[0] == PARSE_FAILED:
+            failed = item[1]
+        elif item[0] == POSITION:
+            store.add(*item[1:])
         else:
-            # tuple of (timecontrol, EGTB string)
-            tc, eg = pair
-            timecontrol[tc] += 1
-            egtb[eg] += 1
+            count_result(item, timecontrol, egtb, monthly, lock, store)
 
-    # Save results to a JSON file
-    # collections.Counter is used to put the most frequent EGTB names first
-    stats = {
-        'timecontrol': timecontrol,
-        'EGTB': dict(Counter(egtb).most_common()),
-    }
+    if store is not None:
+        store.close()
 
-    with open(filepath.with_suffix('.stats.json'), 'w') as f:
-        json.dump(stats, f)
+    report_side_results(filepath, cache_stats, quarantined)
+
+    # Wait for a snapshot in progress: it writes the same temporary file
+    # and could replace the final stats with older ones
+    stop.set()
+    snapshots.join()
+
+    if failed is not None:
+        # Don't pass off partial results as complete ones
+        print(f'Failed to read {filepath.name}: {failed}; stats not saved')
+        return
+
+    # Save results to a JSON file
+    stats = gather_stats(timecontrol, egtb, monthly, lock, thread_counts)
+    write_stats(filepath, *stats)
 
 
 def calculate_material_diff(pieces: str) -> int:
@@ -463,7 +1349,7 @@ def collect_cumulative_results(path: Path, sort_by_material_diff: bool):
     """
     # Check whether directory or a single file were analysed
     if path.is_dir():
-        stats_files = path.glob('*.stats.json')
+        stats_files = tuple(path.glob('*.stats.json'))
         outfolder = path
     else:
         stats_files = (path.with_suffix('.stats.json'),)
@@ -497,6 +1383,11 @@ def collect_cumulative_results(path: Path, sort_by_material_diff: bool):
     with open(outfolder.joinpath('cumulative-stats.json'), 'w') as f:
         json.dump(cumulative, f)
 
+    # Monthly buckets of all files for date-range queries
+    rollup = Rollup.from_stats_files(stats_files)
+    if rollup.months:
+        rollup.save(outfolder.joinpath('rollup.json'))
+
 
 def analyse(
     filepath: Path,
@@ -504,16 +1395,55 @@ def analyse(
     hielo: int,
     exclude: List[str],
     captures: int,
-):
+    store_positions: bool = False,
+    backend: str = 'processes',
+    budget: float = GAME_CPU_BUDGET,
+    replay_cache: int = REPLAY_CACHE_SIZE,
+    fast_replay: bool = False,
+    profile: bool = False,
+    follow: bool = False,
+    snapshot_interval: float = SNAPSHOT_INTERVAL,
+    url: Optional[str] = None,
+    read_ahead: int = remote.READ_AHEAD,
+) -> bool:
     """
-    Launch a multiprocess analysis over compressed PGN file.
+    Launch a parallel analysis over compressed PGN file.
+    Analysis workers are supervised: dead or hung ones are restarted.
+    Return False if the file couldn't be read to the end;
+    its statistics aren't saved then.
 
     :param filepath: path to compressed PGN file
     :param loelo: Lower ELO threshold for both players
     :param hielo: Higher ELO threshold for both players
     :param exclude: list with time controls to exclude
     :param captures: number of captures to reach
+    :param store_positions: save reached positions for further analysis
+    :param backend: run pipeline stages as `processes` or `threads`
+    :param budget: CPU time budget per game, seconds; 0 disables the limit
+    :param replay_cache: opening snapshots per analyser; 0 disables cache
+    :param fast_replay: use non-validating replay engine for clean games
+    :param profile: profile every stage and save merged reports per role
+    :param follow: keep analysing games appended to uncompressed PGN
+    :param snapshot_interval: in follow mode, save stats this often, seconds
+    :param url: stream PGN from this URL; results are saved as for `filepath`
+    :param read_ahead: size of the read-ahead buffer for URLs, bytes
     """
+    Worker, Queue, ResultsQueue = BACKENDS[backend]
+
+    profile_dir = None
+    if profile:
+        profile_dir = filepath.with_suffix('.profile')
+        profiling.prepare_profile_dir(profile_dir)
+
+    def stage(role: str, target: Callable, *args):
+        # Wrap stage function with profiler if needed
+        if profile_dir is None:
+            return Worker(target=target, args=args)
+        return Worker(
+            target=profiling.run_profiled,
+            args=(profile_dir, role, target, *args),
+        )
+
     # Get CPU count to determine the amount of parallel processes
     cpus = mp.cpu_count()
 
@@ -526,60 +1456,570 @@ def analyse(
     # Queues:
     # - 1 queue to accumulate the final results
     # - 1 queue to accumulate 1-game PGNs parsed from the input file
-    pgn_queue = mp.Queue(10_000)
-    results_queue = mp.Queue(1_000)
+    # - 1 queue per analysis worker, fed by the dispatcher
+    # Games queue is bounded so the parser can't run away from analysers
+    pgn_queue = Queue(10_000)
+    results_queue = ResultsQueue()
+    slots = WorkerSlots(MAX_ANALYSIS_WORKERS)
+    dispatcher = Dispatcher(Queue, slots, MAX_ANALYSIS_WORKERS)
+    # Threads count games themselves; the collector adds up their counts
+    thread_counts = [
+        ThreadCounts() if backend == 'threads' else None
+        for _ in range(MAX_ANALYSIS_WORKERS)
+    ]
 
     # Create processes
     processes = []
 
     # - results collector
     processes.append(
-        mp.Process(
-            target=collect_results,
-            args=(filepath, results_queue, MAX_ANALYSIS_WORKERS),
+        stage(
+            'collector',
+            collect_results,
+            filepath,
+            results_queue,
+            MAX_ANALYSIS_WORKERS,
+            store_positions,
+            snapshot_interval if follow else 0.0,
+            [c for c in thread_counts if c is not None],
         )
     )
 
     # - file parser
     processes.append(
-        mp.Process(
-            target=parse_compressed_pgn,
-            args=(
-                filepath,
-                pgn_queue,
-                loelo,
-                hielo,
-                exclude,
-                MAX_ANALYSIS_WORKERS,
-            ),
+        stage(
+            'parser',
+            parse_compressed_pgn,
+            filepath,
+            pgn_queue,
+            loelo,
+            hielo,
+            exclude,
+            # Dispatcher is the only consumer of parsed games
+            1,
+            follow,
+            url,
+            read_ahead,
         )
     )
 
     # - games analysis
-    processes.extend(
-        [
-            mp.Process(
-                target=analyse_game, args=(pgn_queue, results_queue, captures)
-            )
-            for _ in range(MAX_ANALYSIS_WORKERS)
-        ]
-    )
+    def make_analyser(slot: int):
+        return stage(
+            'analyser',
+            analyse_game,
+            dispatcher.queues[slot],
+            results_queue,
+            captures,
+            store_positions,
+            slots,
+            slot,
+            budget,
+            replay_cache,
+            fast_replay,
+            profile_dir,
+            thread_counts[slot],
+        )
+
+    analysers = [make_analyser(i) for i in range(MAX_ANALYSIS_WORKERS)]
 
     # Launch
-    for p in processes:
+    for p in processes + analysers:
         p.start()
 
-    for p in processes:
+    # Collector finishes after all analysers have sent their DONE
+    collector, parser = processes
+    while collector.is_alive():
+        if dispatcher.parsed:
+            collector.join(SUPERVISE_INTERVAL)
+        else:
+            dispatcher.dispatch(pgn_queue, results_queue, SUPERVISE_INTERVAL)
+            dispatcher.check_parser(parser, results_queue)
+        supervise_analysers(
+            analysers, make_analyser, slots, dispatcher, results_queue, budget
+        )
+
+    for p in processes + analysers:
         p.join()
 
+    if profile_dir is not None:
+        profiling.write_reports(profile_dir)
+        print(f'Profiling reports saved to {profile_dir}')
+
+    return dispatcher.failed is None
+
+
+class Dispatcher:
+    """
+    Hand parsed games to analysis workers, each through its own queue.
+
+    A process killed while waiting on a `multiprocessing.Queue` keeps
+    its read lock held for good, so with a shared queue one dead idle
+    worker would stall all the others. A worker's own queue is replaced
+    together with the worker, and the games it hadn't taken are resent.
+    """
+
+    def __init__(self, Queue: Callable, slots: WorkerSlots, workers: int):
+        self.Queue = Queue
+        self.slots = slots
+        self.queues = [Queue() for _ in range(workers)]
+        # Games sent to each worker that it might not have taken yet
+        self.sent = [deque() for _ in range(workers)]
+        self.parsed = False
+        # Reason why the input couldn't be read to the end
+        self.failed = None
+        self._held = None
+        self._next_slot = 0
+
+    def _forget_taken(self, slot: int):
+        """
+        Drop games the worker has already taken from its queue,
+        except the last one: the worker may still be busy with it.
+
+        :param slot: worker index
+        """
+        sent, taken = self.sent[slot], self.slots.taken[slot]
+        while sent and sent[0][0] < taken:
+            sent.popleft()
+
+    def _finish(self):
+        """
+        Tell every worker there are no more games.
+        """
+        self.parsed = True
+        for q in self.queues:
+            q.put('DONE')
+
+    def _send(self, item: tuple) -> bool:
+        """
+        Send game to the next worker with room in its queue.
+        Return False if all workers are busy.
+
+        :param item: (game number, PGN, time control)
+        """
+        workers = len(self.queues)
+        for i in range(workers):
+            slot = (self._next_slot + i) % workers
+            self._forget_taken(slot)
+            if len(self.sent[slot]) < WORKER_QUEUE_SIZE:
+                self.sent[slot].append(item)
+                self.queues[slot].put(item)
+                self._next_slot = (slot + 1) % workers
+                return True
+        return False
+
+    def dispatch(
+        self, pgn_queue: mp.Queue, results_queue: mp.Queue, timeout: float
+    ):
+        """
+        Move parsed games to workers' queues for up to `timeout` seconds.
+        Parser failure is passed on to the collector.
+
+        :param pgn_queue: queue with parsed games
+        :param results_queue: queue for analysis results
+        :param timeout: time to return after, seconds
+        """
+        deadline = time.monotonic() + timeout
+        while not self.parsed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if self._held is None:
+                try:
+                    self._held = pgn_queue.get(timeout=remaining)
+                except queue.Empty:
+                    return
+
+            if self._held == 'DONE':
+                self._finish()
+            elif self._held[0] == PARSE_FAILED:
+                self.failed = self._held[1]
+                results_queue.put(self._held)
+            elif not self._send(self._held):
+                # Keep the game until some worker has room
+                time.sleep(DISPATCH_POLL_INTERVAL)
+                continue
+            self._held = None
+
+    def check_parser(
+        self,
+        parser: Union[mp.Process, threading.Thread],
+        results_queue: mp.Queue,
+    ):
+        """
+        Stop dispatching if the parser has died without finishing
+        the input (e.g. killed by the OS when out of memory):
+        it never sends DONE then. Handled the same as a read failure.
+
+        :param parser: parser worker
+        :param results_queue: queue for analysis results
+        """
+        # Threads can't be killed, they have no exit code
+        exitcode = getattr(parser, 'exitcode', None)
+        if not exitcode or self.parsed:
+            return
+        self.failed = f'parser died (exit code {exitcode})'
+        results_queue.put((PARSE_FAILED, self.failed))
+        self._finish()
+
+    def replace_queue(self, slot: int) -> Optional[tuple]:
+        """
+        Create a new queue for a restarted worker
+        with the games its predecessor hadn't taken.
+        Return the last game the predecessor had taken, if it's known:
+        it was either analysed or is quarantined, so it isn't resent.
+
+        :param slot: worker index
+        """
+        old = self.queues[slot]
+        if hasattr(old, 'cancel_join_thread'):
+            # Nobody will read the rest; don't wait to flush it on exit
+            old.cancel_join_thread()
+
+        self._forget_taken(slot)
+        sent, taken = self.sent[slot], None
+        if sent and sent[0][0] == self.slots.taken[slot]:
+            taken = sent.popleft()
+
+        self.queues[slot] = self.Queue()
+        for item in self.sent[slot]:
+            self.queues[slot].put(item)
+        if self.parsed:
+            self.queues[slot].put('DONE')
+        return taken
+
+
+def supervise_analysers(
+    analysers: list,
+    make_analyser: Callable[[int], Union[mp.Process, threading.Thread]],
+    slots: WorkerSlots,
+    dispatcher: Dispatcher,
+    results_queue: mp.Queue,
+    budget: float,
+):
+    """
+    Find dead or hung analysis workers and replace them.
+    The game a worker was busy with is sent for quarantine.
+
+    :param analysers: list of analysis workers; updated in place
+    :param make_analyser: function to create a new worker for a slot
+    :param slots: shared workers state
+    :param dispatcher: dispatcher of games to workers' queues
+    :param results_queue: queue for analysis results
+    :param budget: CPU time budget per game, seconds
+    """
+    for slot, worker in enumerate(analysers):
+        # Check liveness first: state of a dead worker is final,
+        # while a live one may send its DONE and exit right after
+        alive = worker.is_alive()
+        state = slots.game[slot]
+        if state == WorkerSlots.SENT_DONE:
+            # Finished normally
+            continue
+
+        if alive:
+            # Threads can't be terminated; only processes are checked
+            elapsed = time.time() - slots.started[slot]
+            busy = state > 0 and hasattr(worker, 'terminate')
+            too_long = elapsed > budget * HUNG_WORKER_FACTOR
+            if not (budget and busy and too_long):
+                continue
+            worker.terminate()
+            worker.join()
+            reason = f'worker hung for {elapsed:.0f}s'
+        else:
+            exitcode = getattr(worker, 'exitcode', None)
+            reason = f'worker died (exit code {exitcode})'
+
+        if state == WorkerSlots.GOT_DONE:
+            # Input queue is exhausted; only DONE was lost
+            results_queue.put('DONE')
+            slots.game[slot] = WorkerSlots.SENT_DONE
+            continue
+
+        slots.game[slot] = WorkerSlots.IDLE
+        taken = dispatcher.replace_queue(slot)
+        if state > 0:
+            # Keep PGN of the game that took the worker down, if it's known
+            pgn = taken[1] if taken is not None and taken[0] == state else None
+            results_queue.put((QUARANTINE, state, pgn, reason))
+
+        analysers[slot] = make_analyser(slot)
+        analysers[slot].start()
+        print(f'Restarted analysis worker #{slot}: {reason}')
+
+
+def gil_enabled() -> bool:
+    """
+    Check if the interpreter runs with the GIL.
+    """
+    # `sys._is_gil_enabled` exists since Python 3.13;
+    # older versions always have the GIL
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is None or is_gil_enabled()
+
+
+def resolve_backend(backend: str) -> str:
+    """
+    Choose pipeline backend that can actually run in parallel.
+    Threads only make sense on free-threaded builds; fall back to processes
+    if the GIL is enabled.
+
+    :param backend: requested backend
+    """
+    if backend == 'threads' and gil_enabled():
+        print('GIL is enabled, falling back to processes backend')
+        return 'processes'
+    return backend
+
 
 # ---- End of: Statistics and multiprocessing routines ----
 
+# ---- Streaming API ----
+class GameResult(NamedTuple):
+    """
+    Analysis result of one eligible game.
+    `egtb` is None if no suitable position was reached
+    or the game couldn't be analysed (then `error` says why).
+    """
+
+    game_no: int
+    timecontrol: str
+    egtb: Optional[str]
+    error: Optional[str] = None
+
+
+class Stats:
+    """
+    Mergeable accumulator of game results
+    with the same layout as `.stats.json` files.
+    """
+
+    def __init__(self):
+        self.timecontrol = defaultdict(int)
+        self.egtb = defaultdict(int)
+
+    def add(self, result: GameResult):
+        """
+        Count game result; only games that reached a position count.
+
+        :param result: result of one game
+        """
+        if result.egtb is None:
+            return
+        self.timecontrol[result.timecontrol] += 1
+        self.egtb[result.egtb] += 1
+
+    def merge(self, other: 'Stats') -> 'Stats':
+        """
+        Add counts from another accumulator to this one.
+
+        :param other: accumulator to merge
+        """
+        for k, v in other.timecontrol.items():
+            self.timecontrol[k] += v
+        for k, v in other.egtb.items():
+            self.egtb[k] += v
+        return self
+
+    def __add__(self, other: 'Stats') -> 'Stats':
+        """
+        New accumulator with counts of both; operands aren't changed.
+
+        :param other: accumulator to add
+        """
+        return Stats().merge(self).merge(other)
+
+    @property
+    def total_games(self) -> int:
+        """
+        Number of games that reached a position.
+        """
+        return sum(self.timecontrol.values())
+
+    def to_dict(self) -> dict:
+        """
+        Statistics in the layout of `.stats.json` files.
+        """
+        return stats_dict(self.timecontrol, self.egtb)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Stats':
+        """
+        Create accumulator from `.stats.json` data.
+
+        :param data: statistics dict
+        """
+        stats = cls()
+        stats.timecontrol.update(data['timecontrol'])
+        stats.egtb.update(data['EGTB'])
+        return stats
+
+
+def iter_lines(source: Iterable[Union[str, bytes]]) -> Iterator[str]:
+    """
+    Split a stream of PGN text or bytes chunks of any size into lines.
+
+    :param source: iterable of str/bytes chunks (e.g. file object, socket)
+        or a single str/bytes with whole PGN
+    """
+    if isinstance(source, (str, bytes)):
+        # Iterating over them gives characters or ints, not chunks
+        source = (source,)
+
+    partial = ''
+    for chunk in source:
+        if isinstance(chunk, bytes):
+            # Same encoding as for PGN files
+            chunk = chunk.decode('latin-1')
+        # Only `\n` ends a line: `str.splitlines` also breaks at characters
+        # like `\x85`, which latin-1 gives for bytes of UTF-8 text
+        *lines, partial = (partial + chunk).split('\n')
+        for line in lines:
+            yield line + '\n'
+
+    # Terminate the last game even if the stream lacks the final newline:
+    # movetext has to be followed by an empty line
+    if partial:
+        yield partial + '\n'
+    yield '\n'
+
+
+def analyse_games(
+    pgns: List[List[str]], captures: int
+) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Determine EGTBs for a batch of games.
+    Return (EGTB or None, error or None) for each game.
+
+    :param pgns: list with parsed PGNs
+    :param captures: number of captures to reach
+    """
+    results = []
+    for pgn in pgns:
+        try:
+            results.append((play_game(pgn, captures), None))
+        except Exception as e:
+            # Malformed game that python-chess couldn't handle
+            results.append((None, repr(e)))
+    return results
+
+
+def iter_batches(
+    source: Iterable[Union[str, bytes]],
+    loelo: int,
+    hielo: int,
+    exclude: Iterable[str],
+    batch_size: int,
+) -> Iterator[List[Tuple[int, List[str], str]]]:
+    """
+    Parse PGN stream into batches of eligible games.
+
+    :param source: iterable of PGN str/bytes chunks
+    :param loelo: lower ELO threshold
+    :param hielo: higher ELO threshold
+    :param exclude: time controls to exclude
+    :param batch_size: number of games per batch
+    """
+    lines = iter_lines(source)
+    batch = []
+    for game_no in count(1):
+        try:
+            pgn = next_pgn(lines)
+        except StopIteration:
+            break
+        tc = eligible_time_control(pgn, loelo, hielo, exclude)
+        if tc is None:
+            continue
+        batch.append((game_no, pgn, tc))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def analyse_stream(
+    source: Iterable[Union[str, bytes]],
+    loelo: int = 2000,
+    hielo: int = 4000,
+    exclude: Iterable[str] = (),
+    captures: int = REQUIRED_CAPTURES_7_MAN,
+    executor: Optional[Executor] = None,
+    batch_size: int = 100,
+    max_pending: int = 16,
+) -> Iterator[GameResult]:
+    """
+    Analyse games from a PGN stream without touching disk.
+    Results for eligible games are yielded lazily, in stream order.
+
+    Example::
+
+        stats = Stats()
+        with open('games.pgn') as f:
+            for result in analyse_stream(f, loelo=2400):
+                stats.add(result)
+
+    :param source: iterable of PGN str/bytes chunks of any size
+        or a single str/bytes with whole PGN
+    :param loelo: lower ELO threshold for both players
+    :param hielo: higher ELO threshold for both players
+    :param exclude: time controls to exclude
+    :param captures: number of captures to reach
+    :param executor: optional `concurrent.futures` executor
+        to analyse batches of games in parallel
+    :param batch_size: number of games sent to executor at once
+    :param max_pending: max number of batches in executor at once
+    """
+    batches = iter_batches(source, loelo, hielo, exclude, batch_size)
+
+    if executor is None:
+        for batch in batches:
+            pgns = [pgn for _, pgn, _ in batch]
+            yield from batch_results(batch, analyse_games(pgns, captures))
+        return
+
+    # Keep a bounded number of batches in flight
+    # so an endless stream isn't read ahead
+    pending = deque()
+    for batch in batches:
+        pgns = [pgn for _, pgn, _ in batch]
+        pending.append((batch, executor.submit(analyse_games, pgns, captures)))
+        if len(pending) >= max_pending:
+            batch, future = pending.popleft()
+            yield from batch_results(batch, future.result())
+
+    while pending:
+        batch, future = pending.popleft()
+        yield from batch_results(batch, future.result())
+
+
+def batch_results(
+    batch: List[Tuple[int, List[str], str]],
+    results: List[Tuple[Optional[str], Optional[str]]],
+) -> Iterator[GameResult]:
+    """
+    Combine batch of games with their analysis results.
+
+    :param batch: list of (game number, PGN, time control)
+    :param results: list of (EGTB or None, error or None)
+    """
+    for (game_no, _, tc), (egtb, error) in zip(batch, results):
+        yield GameResult(game_no, tc, egtb, error)
+
+
+# ---- End of: Streaming API ----
+
 
 def main():
     ap = ArgumentParser()
     ap.add_argument(
-        'path', type=Path, help='Path to DB file or folder with multiple files'
+        'path',
+        help=(
+            'Path to DB file or folder with multiple files, '
+            'or HTTP(S) URL of DB file to analyse while downloading'
+        ),
     )
     ap.add_argument(
         '--loelo', type=int, default=2000, help='Lower ELO threshold'
@@ -610,6 +2050,87 @@ def main():
         action='store_true',
         help='Sort EGTB results by material difference (least to most)',
     )
+    ap.add_argument(
+        '--positions',
+        action='store_true',
+        help=(
+            'Store reached positions in a compact binary form '
+            'for unique-position statistics (see positions.py)'
+        ),
+    )
+    ap.add_argument(
+        '--game-timeout',
+        type=float,
+        default=GAME_CPU_BUDGET,
+        help=(
+            'CPU time budget per game in seconds; games over the budget '
+            'are quarantined. 0 disables the limit. '
+            f'Default: {GAME_CPU_BUDGET:g}'
+        ),
+    )
+    ap.add_argument(
+        '--replay-cache',
+        type=int,
+        default=REPLAY_CACHE_SIZE,
+        help=(
+            'Number of opening snapshots each analysis worker keeps '
+            'to avoid replaying common openings. 0 disables the cache. '
+            f'Default: {REPLAY_CACHE_SIZE}'
+        ),
+    )
+    ap.add_argument(
+        '--fast-replay',
+        action='store_true',
+        help=(
+            'Replay games with a lightweight non-validating engine; '
+            'games it can\'t resolve are replayed by python-chess '
+            '(see replay.py)'
+        ),
+    )
+    ap.add_argument(
+        '--profile',
+        action='store_true',
+        help=(
+            'Profile parser, analysers and collector; merged reports '
+            'per role and replay-time histogram are saved next to the file'
+        ),
+    )
+    ap.add_argument(
+        '--follow',
+        action='store_true',
+        help=(
+            'Keep analysing games appended to a growing PGN file '
+            '(uncompressed only) and periodically update its stats'
+        ),
+    )
+    ap.add_argument(
+        '--snapshot-interval',
+        type=float,
+        default=SNAPSHOT_INTERVAL,
+        help=(
+            'In follow mode, how often to update stats file, seconds. '
+            f'Default: {SNAPSHOT_INTERVAL:g}'
+        ),
+    )
+    ap.add_argument(
+        '--read-ahead',
+        type=int,
+        default=remote.READ_AHEAD // 1_048_576,
+        help=(
+            'For URLs, how much downloaded data to buffer ahead of '
+            f'analysis, MB. Default: {remote.READ_AHEAD // 1_048_576}'
+        ),
+    )
+    ap.add_argument(
+        '--backend',
+        choices=tuple(BACKENDS),
+        default='processes',
+        help=(
+            'Run pipeline stages as processes or threads. '
+            'Threads require free-threaded Python (3.13t+). '
+            'Default: processes'
+        ),
+    )
 
     args = ap.parse_args()
 
@@ -624,28 +2145,66 @@ def main():
         print('Invalid number of captures')
         sys.exit(2)
 
-    if args.path.is_dir():
-        files = tuple(args.path.glob('*.pgn.bz2'))
+    # Results of a URL are saved to the current folder
+    # under the name of the remote file
+    url = args.path if remote.is_url(args.path) else None
+    path = Path(remote.url_filename(url) if url else args.path)
+
+    # Follow mode runs until interrupted, so the position store
+    # would never be closed and written out
+    if args.follow and (url or path.suffix != '.pgn' or args.positions):
+        print(
+            'Follow mode works with a single local uncompressed PGN file '
+            'and without --positions'
+        )
+        sys.exit(3)
+
+    if path.is_dir():
+        files = tuple(path.glob('*.pgn.bz2'))
     else:
-        files = (args.path,)
+        files = (path,)
 
     total = len(files)
+    backend = resolve_backend(args.backend)
+    if args.profile and backend == 'threads':
+        # Only one profiler can be active per interpreter in Python 3.12+
+        print('Profiling needs processes backend, falling back to it')
+        backend = 'processes'
 
+    failed = []
     for idx, f in enumerate(files, start=1):
-        print(
-            f'Analysing {f.name} ({idx}/{total}) '
-            f'[size:{f.stat().st_size / 1_000_000: .1f} MB]'
-        )
-        analyse(
+        if url:
+            size = 'remote'
+        else:
+            size = f'size:{f.stat().st_size / 1_000_000: .1f} MB'
+        print(f'Analysing {f.name} ({idx}/{total}) [{size}]')
+        complete = analyse(
             f,
             args.loelo,
             args.hielo,
             args.exclude,
             args.captures,
+            args.positions,
+            backend,
+            args.game_timeout,
+            args.replay_cache,
+            args.fast_replay,
+            args.profile,
+            args.follow,
+            args.snapshot_interval,
+            url,
+            args.read_ahead * 1_048_576,
         )
+        if not complete:
+            failed.append(f.name)
+
+    if failed:
+        # Cumulative results would mix in stale stats of these files
+        print(f'Could not read {", ".join(failed)}; no cumulative results')
+        sys.exit(4)
 
     print('Computing cumulative results…')
-    collect_cumulative_results(args.path, args.sort_by_material_diff)
+    collect_cumulative_results(path, args.sort_by_material_diff)
 
 
 if __name__ == '__main__':
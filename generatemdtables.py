@@ -1,9 +1,14 @@
+import hashlib
 import json
 from argparse import ArgumentParser
 from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from rollup import Rollup, month_arg
 
 LINK_ROOT = 'https://tablebase.lichess.ovh/tables/standard/7'
 GIGABYTE = 1_000_000_000
+DATABASES = ('caissa', 'mega', 'lichess')
 
 
 def folder_from_egtb_name(name: str) -> str:
@@ -18,22 +23,48 @@ def folder_from_egtb_name(name: str) -> str:
     return prefix + suffix
 
 
+def write_if_changed(path: Path, content: str) -> bool:
+    """
+    Write file only if its content differs from the one on disk.
+    Returns True if file was written.
+
+    :param path: file to write
+    :param content: new file content
+    """
+    data = content.encode()
+    new_hash = hashlib.sha256(data).digest()
+    try:
+        # Different size means different content; skip reading
+        if path.stat().st_size == len(data):
+            old_hash = hashlib.sha256(path.read_bytes()).digest()
+            if old_hash == new_hash:
+                return False
+    except FileNotFoundError:
+        pass
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return True
+
+
 def generate_table(
-    key: str, statsfile: Path, linksfolder: Path, threshold: float
-) -> list:
+    key: str,
+    data: dict,
+    filesizes: Dict[str, int],
+    linksfolder: Path,
+    threshold: float,
+) -> Tuple[list, Dict[Path, str]]:
     """
     Generate Markdown tables with download links
-    from a JSON file with stats.
+    from stats data.
+    Returns table rows and contents of DL lists with links.
 
     :param key: key in cumulative stats
-    :param statsfile: input file with stats
+    :param data: cumulative stats
+    :param filesizes: EGTB file sizes
     :param linksfolder: folder to store DL lists with links
     :param threshold: threshold for percentage of games
     """
-
-    with open(statsfile) as f:
-        data = json.load(f)
-
     total = data['total_games']
 
     egtb_orig = data[key]
@@ -41,14 +72,14 @@ def generate_table(
         '|#|Name|No. of games|Percentage|WDL|WDL (cumulative)|Download|WDL+DTZ|WDL+DTZ (cumulative)|Download|',
         '|:----:|:----:|:----:|:----:|:----:|:----:|:----:|:----:|:----:|:----:|',
     ]
-    links_wdl = []
-    links_wdl_dtz = []
+    # DL lists are cumulative: top-N list is top-(N-1) list + new links.
+    # Keep the prefix as a string so every list is built with one append
+    links_wdl = ''
+    links_wdl_dtz = ''
+    lists = {}
     cumulative_wdl = 0
     cumulative_wdl_dtz = 0
 
-    with open('filesizes.json') as f:
-        filesizes = json.load(f)
-
     for idx, val in enumerate(egtb_orig.items(), start=1):
         name, amount = val
         percentage = amount / total * 100
@@ -62,20 +93,15 @@ def generate_table(
         wdl_link = f'{LINK_ROOT}/{folder_from_egtb_name(name)}/{name}.rtbw'
         dtz_link = f'{LINK_ROOT}/{folder_from_egtb_name(name)}/{name}.rtbz'
 
-        links_wdl.append(wdl_link)
+        links_wdl += wdl_link + '\n'
         wdl_path = f'{key[5:]}/top-{idx}-wdl.txt'
         wdl_store_as = linksfolder.joinpath(wdl_path)
-        with open(wdl_store_as, 'w') as f:
-            for lnk in links_wdl:
-                f.write(lnk + '\n')
+        lists[wdl_store_as] = links_wdl
 
-        links_wdl_dtz.append(wdl_link)
-        links_wdl_dtz.append(dtz_link)
+        links_wdl_dtz += wdl_link + '\n' + dtz_link + '\n'
         wdl_dtz_path = f'{key[5:]}/top-{idx}-wdl-dtz.txt'
         wdl_dtz_store_as = linksfolder.joinpath(wdl_dtz_path)
-        with open(wdl_dtz_store_as, 'w') as f:
-            for lnk in links_wdl_dtz:
-                f.write(lnk + '\n')
+        lists[wdl_dtz_store_as] = links_wdl_dtz
 
         tablerows.append(
             f'|{idx}'
@@ -90,46 +116,140 @@ def generate_table(
             f'|[List](../{wdl_dtz_store_as})'
         )
 
-    return tablerows
+    return tablerows, lists
+
+
+def default_rollup_path(db: str) -> Path:
+    """
+    Rollup file of the database in `json_stats`.
+
+    :param db: name of the database
+    """
+    return Path(f'./json_stats/{db}.rollup.json')
 
 
-def generate_md_file(db: str):
+def generate_md_file(
+    db: str,
+    filesizes: Dict[str, int],
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    rollup_path: Optional[Path] = None,
+) -> Tuple[int, int]:
     """
-    Generate final Markdown file with tables.
+    Generate final Markdown file with tables and DL lists.
+    If `since` or `until` is given, tables are generated for games
+    played in that window of months (from the rollup file)
+    and saved as `<db>_<since>_<until>`.
+    Only files with changed content are written.
+    Returns number of written and unchanged files.
 
     :param db: name of the database
+    :param filesizes: EGTB file sizes
+    :param since: first month of the window (YYYY-MM)
+    :param until: last month of the window (YYYY-MM)
+    :param rollup_path: rollup file for the window;
+        default: `json_stats/<db>.rollup.json`
     """
-    statsfile = Path(f'./json_stats/{db}.json')
-    linksfolder = Path(f'./download_lists/{db}')
-    mdfile = Path(f'./markdown_tables/{db}.md')
+    if since is None and until is None:
+        name, title = db, db.capitalize()
+        with open(Path(f'./json_stats/{db}.json')) as f:
+            data = json.load(f)
+    else:
+        name = f'{db}_{since or "first"}_{until or "last"}'
+        title = f'{db.capitalize()} ({since or "…"} — {until or "…"})'
+        if rollup_path is None:
+            rollup_path = default_rollup_path(db)
+        rollup = Rollup.load(rollup_path)
+        data = rollup.query(since, until)
+
+    linksfolder = Path(f'./download_lists/{name}')
+    mdfile = Path(f'./markdown_tables/{name}.md')
 
-    material_diff = generate_table(
-        'EGTB_material_diff', statsfile, linksfolder, 0.0995
+    material_diff, material_diff_lists = generate_table(
+        'EGTB_material_diff', data, filesizes, linksfolder, 0.0995
     )
-    most_games = generate_table(
-        'EGTB_most_games', statsfile, linksfolder, 0.995
+    most_games, most_games_lists = generate_table(
+        'EGTB_most_games', data, filesizes, linksfolder, 0.995
     )
 
-    with open(mdfile, 'w') as f:
-        f.write(f'# {db.capitalize()}\n\n')
+    md = f'# {title}\n\n'
 
-        f.write('**Least material imbalance**\n')
-        for line in material_diff:
-            f.write(line + '\n')
+    md += '**Least material imbalance**\n'
+    for line in material_diff:
+        md += line + '\n'
 
-        f.write('<br />\n')
+    md += '<br />\n'
 
-        f.write('\n**Most games**\n')
-        for line in most_games:
-            f.write(line + '\n')
+    md += '\n**Most games**\n'
+    for line in most_games:
+        md += line + '\n'
+
+    files = {**material_diff_lists, **most_games_lists, mdfile: md}
+    written = sum(write_if_changed(path, text) for path, text in files.items())
+    return written, len(files) - written
 
 
 def main():
     ap = ArgumentParser()
-    ap.add_argument('db', choices=('caissa', 'mega', 'lichess'))
+    ap.add_argument(
+        'db',
+        nargs='*',
+        metavar='DB',
+        help=(
+            f'Databases to generate tables for: {", ".join(DATABASES)}. '
+            'Default: all'
+        ),
+    )
+    ap.add_argument(
+        '--since',
+        type=month_arg,
+        help=(
+            'Only count games played since this month (YYYY-MM), '
+            'using json_stats/<DB>.rollup.json'
+        ),
+    )
+    ap.add_argument(
+        '--until',
+        type=month_arg,
+        help=(
+            'Only count games played until this month (YYYY-MM), '
+            'using json_stats/<DB>.rollup.json'
+        ),
+    )
+    ap.add_argument(
+        '--rollup',
+        type=Path,
+        help=(
+            'Rollup file to use with --since/--until instead of '
+            'json_stats/<DB>.rollup.json (e.g. rollup.json written '
+            'by egtb.py). Requires a single DB'
+        ),
+    )
     args = ap.parse_args()
 
-    generate_md_file(args.db)
+    # `choices` doesn't play well with an empty `nargs='*'` in argparse
+    unknown = set(args.db) - set(DATABASES)
+    if unknown:
+        ap.error(f'unknown databases: {", ".join(sorted(unknown))}')
+
+    window = args.since or args.until
+    if args.rollup and not (window and len(args.db) == 1):
+        ap.error('--rollup needs --since/--until and a single DB')
+
+    # Sizes are the same for every database
+    with open('filesizes.json') as f:
+        filesizes = json.load(f)
+
+    for db in args.db or DATABASES:
+        rollup_path = args.rollup or default_rollup_path(db)
+        if window and not rollup_path.exists():
+            # Not every database has games with known months
+            print(f'{db}: no {rollup_path}, skipped')
+            continue
+        written, unchanged = generate_md_file(
+            db, filesizes, args.since, args.until, rollup_path
+        )
+        print(f'{db}: {written} files written, {unchanged} unchanged')
 
 
 if __name__ == '__main__':
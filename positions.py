@@ -0,0 +1,345 @@
+"""
+    positions.py
+    ~~~~
+    Compact on-disk store of reached positions
+    and tool to compute unique-position statistics from it
+"""
+
+import heapq
+import struct
+from argparse import ArgumentParser
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# ---- Constants and shared values ----
+# Piece codes are stored as nibbles: bit 3 is the colour (set for Black),
+# bits 0-2 are the piece type. Code 0 is never used for a piece
+PIECE_CODES = {
+    'P': 1,
+    'N': 2,
+    'B': 3,
+    'R': 4,
+    'Q': 5,
+    'K': 6,
+    'p': 9,
+    'n': 10,
+    'b': 11,
+    'r': 12,
+    'q': 13,
+    'k': 14,
+}
+PIECE_SYMBOLS = {v: k for k, v in PIECE_CODES.items()}
+
+# Side to move is stored in the nibble that follows piece codes
+WHITE_TO_MOVE = 0
+BLACK_TO_MOVE = 1
+
+# Occupancy bitboard (8 bytes) that precedes piece codes
+OCCUPANCY = struct.Struct('<Q')
+
+# Number of times position was reached; follows position in the store
+COUNT = struct.Struct('<Q')
+
+# Number of distinct positions to keep in memory before spilling to disk
+SPILL_THRESHOLD = 1_000_000
+
+# ---- End of: Constants and shared values ----
+
+
+# ---- Position encoding ----
+def record_size(pieces: int) -> int:
+    """
+    Size of packed position in bytes.
+
+    :param pieces: number of pieces on the board
+    """
+    # Occupancy + 1 nibble per piece + 1 nibble for side to move
+    return OCCUPANCY.size + (pieces + 2) // 2
+
+
+def pieces_from_egtb_name(name: str) -> int:
+    """
+    Number of pieces in EGTB name (e.g. KRPPvKRP -> 7).
+
+    :param name: EGTB name
+    """
+    return len(name) - 1
+
+
+def encode_position(pieces: Dict[int, str], white_to_move: bool) -> bytes:
+    """
+    Pack position into a fixed-width binary record.
+
+    Layout: occupancy bitboard (64 bits, little endian)
+    followed by piece codes as nibbles in ascending square order
+    and side to move in the last nibble.
+    Same position always produces the same bytes,
+    so records can be sorted and deduplicated as-is.
+
+    :param pieces: mapping of square index (a1 = 0, h8 = 63) to FEN symbol
+    :param white_to_move: side to move
+    """
+    occupancy = 0
+    nibbles = []
+    for square in sorted(pieces):
+        occupancy |= 1 << square
+        nibbles.append(PIECE_CODES[pieces[square]])
+    nibbles.append(WHITE_TO_MOVE if white_to_move else BLACK_TO_MOVE)
+    if len(nibbles) % 2:
+        # Pad to full byte
+        nibbles.append(0)
+
+    packed = bytes(
+        nibbles[i] << 4 | nibbles[i + 1] for i in range(0, len(nibbles), 2)
+    )
+    return OCCUPANCY.pack(occupancy) + packed
+
+
+def decode_position(
+    record: bytes, pieces: int
+) -> Tuple[Dict[int, str], bool]:
+    """
+    Unpack binary record produced by `encode_position`.
+
+    :param record: packed position
+    :param pieces: number of pieces on the board
+    """
+    (occupancy,) = OCCUPANCY.unpack_from(record)
+    nibbles = []
+    for byte in record[OCCUPANCY.size :]:
+        nibbles.append(byte >> 4)
+        nibbles.append(byte & 0x0F)
+
+    squares = [sq for sq in range(64) if occupancy >> sq & 1]
+    board = {
+        sq: PIECE_SYMBOLS[code] for sq, code in zip(squares, nibbles[:pieces])
+    }
+    return board, nibbles[pieces] == WHITE_TO_MOVE
+
+
+def position_to_fen(record: bytes, pieces: int) -> str:
+    """
+    Convert packed position to partial FEN (placement and side to move).
+
+    :param record: packed position
+    :param pieces: number of pieces on the board
+    """
+    board, white_to_move = decode_position(record, pieces)
+    ranks = []
+    for rank in range(7, -1, -1):
+        row, empty = '', 0
+        for file in range(8):
+            symbol = board.get(rank * 8 + file)
+            if symbol is None:
+                empty += 1
+                continue
+            if empty:
+                row += str(empty)
+                empty = 0
+            row += symbol
+        if empty:
+            row += str(empty)
+        ranks.append(row)
+
+    return '/'.join(ranks) + (' w' if white_to_move else ' b')
+
+
+# ---- End of: Position encoding ----
+
+
+# ---- Sort/merge store ----
+def write_run(path: Path, counts: Dict[bytes, int]):
+    """
+    Write sorted run of (position, count) records to disk.
+
+    :param path: run file
+    :param counts: positions with counts
+    """
+    with open(path, 'wb') as f:
+        for record in sorted(counts):
+            f.write(record)
+            f.write(COUNT.pack(counts[record]))
+
+
+def read_run(path: Path, size: int) -> Iterator[Tuple[bytes, int]]:
+    """
+    Read sorted (position, count) records from disk.
+
+    :param path: run file
+    :param size: packed position size in bytes
+    """
+    chunk = size + COUNT.size
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(chunk)
+            if len(data) < chunk:
+                break
+            (cnt,) = COUNT.unpack_from(data, size)
+            yield data[:size], cnt
+
+
+def merge_runs(
+    runs: Iterable[Iterator[Tuple[bytes, int]]]
+) -> Iterator[Tuple[bytes, int]]:
+    """
+    Merge sorted runs, summing counts of equal positions.
+
+    :param runs: iterators over sorted (position, count) records
+    """
+    current, total = None, 0
+    for record, cnt in heapq.merge(*runs):
+        if record == current:
+            total += cnt
+            continue
+        if current is not None:
+            yield current, total
+        current, total = record, cnt
+
+    if current is not None:
+        yield current, total
+
+
+class PositionStore:
+    """
+    Collect packed positions grouped by EGTB
+    and deduplicate them with counts through sort/merge on disk.
+
+    Positions are counted in memory until `threshold` distinct ones
+    are gathered, then every table is spilled into a sorted run file.
+    `close` merges the runs into one sorted `<EGTB>.bin` file per table.
+    """
+
+    def __init__(self, folder: Path, threshold: int = SPILL_THRESHOLD):
+        self.folder = folder
+        self.threshold = threshold
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+        # Same as with stats files, re-running analysis replaces old results
+        for stale in self.folder.glob('*.bin'):
+            stale.unlink()
+        for stale in self.folder.glob('*.run*'):
+            stale.unlink()
+
+        self._counts = defaultdict(lambda: defaultdict(int))
+        self._runs = defaultdict(list)
+        self._distinct = 0
+
+    def add(self, egtb: str, record: bytes):
+        """
+        Count one occurrence of packed position.
+
+        :param egtb: EGTB name
+        :param record: packed position
+        """
+        table = self._counts[egtb]
+        if record not in table:
+            self._distinct += 1
+        table[record] += 1
+
+        if self._distinct >= self.threshold:
+            self.spill()
+
+    def spill(self):
+        """
+        Write positions kept in memory into sorted run files.
+        """
+        for egtb, counts in self._counts.items():
+            run = self.folder.joinpath(f'{egtb}.run{len(self._runs[egtb])}')
+            write_run(run, counts)
+            self._runs[egtb].append(run)
+
+        self._counts.clear()
+        self._distinct = 0
+
+    def close(self):
+        """
+        Merge all runs into final per-table files.
+        """
+        self.spill()
+
+        for egtb, runs in self._runs.items():
+            size = record_size(pieces_from_egtb_name(egtb))
+            outfile = self.folder.joinpath(f'{egtb}.bin')
+            merged = merge_runs(read_run(run, size) for run in runs)
+            with open(outfile, 'wb') as f:
+                for record, cnt in merged:
+                    f.write(record)
+                    f.write(COUNT.pack(cnt))
+
+            for run in runs:
+                run.unlink()
+
+        self._runs.clear()
+
+
+# ---- End of: Sort/merge store ----
+
+
+# ---- Statistics ----
+def table_stats(
+    files: List[Path], top: int
+) -> Tuple[int, int, List[Tuple[bytes, int]]]:
+    """
+    Calculate number of positions, unique positions and top positions
+    for one EGTB, merging stores from several analysed files.
+
+    :param files: `<EGTB>.bin` files of the same table
+    :param top: number of most frequent positions to return
+    """
+    size = record_size(pieces_from_egtb_name(files[0].stem))
+
+    total, unique, most_common = 0, 0, []
+    for record, cnt in merge_runs(read_run(file, size) for file in files):
+        total += cnt
+        unique += 1
+        # Keep `top` most frequent positions in a min-heap
+        if len(most_common) < top:
+            heapq.heappush(most_common, (cnt, record))
+        elif cnt > most_common[0][0]:
+            heapq.heapreplace(most_common, (cnt, record))
+
+    most_common = [
+        (record, cnt) for cnt, record in sorted(most_common, reverse=True)
+    ]
+    return total, unique, most_common
+
+
+def main():
+    ap = ArgumentParser()
+    ap.add_argument(
+        'folders',
+        nargs='+',
+        type=Path,
+        help='Folders with stored positions (*.positions) to combine',
+    )
+    ap.add_argument(
+        '--top',
+        type=int,
+        default=5,
+        help='Number of most frequent positions to show per EGTB',
+    )
+
+    args = ap.parse_args()
+
+    tables = defaultdict(list)
+    for folder in args.folders:
+        for file in folder.glob('*.bin'):
+            tables[file.stem].append(file)
+
+    stats = {
+        egtb: table_stats(files, args.top) for egtb, files in tables.items()
+    }
+
+    # Most reached tables first
+    for egtb, (total, unique, most_common) in sorted(
+        stats.items(), key=lambda pair: -pair[1][0]
+    ):
+        print(f'{egtb}: {total:,} positions, {unique:,} unique')
+        pieces = pieces_from_egtb_name(egtb)
+        for record, cnt in most_common:
+            print(f'    {cnt:>10,}  {position_to_fen(record, pieces)}')
+
+
+if __name__ == '__main__':
+    main()
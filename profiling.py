@@ -0,0 +1,158 @@
+"""
+    profiling.py
+    ~~~~
+    Per-process profiling of pipeline stages and replay-time histograms
+"""
+
+import cProfile
+import json
+import os
+import pstats
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable
+
+# ---- Constants and shared values ----
+# Pipeline stage roles; profiles of processes with the same role are merged
+ROLES = ('parser', 'analyser', 'collector')
+
+# Number of functions in merged reports
+REPORT_LINES = 40
+
+# Game length bucket size in the replay-time histogram, half-moves
+PLIES_BUCKET = 20
+
+# ---- End of: Constants and shared values ----
+
+
+def run_profiled(profile_dir: Path, role: str, target: Callable, *args):
+    """
+    Run pipeline stage under cProfile and dump its profile
+    to `<role>-<pid>.prof` when the stage finishes.
+
+    :param profile_dir: folder for profiles
+    :param role: stage role, one of ROLES
+    :param target: stage function
+    :param args: stage function arguments
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        target(*args)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(profile_dir.joinpath(f'{role}-{os.getpid()}.prof'))
+
+
+class ReplayTimes:
+    """
+    Histogram of game replay times keyed by game length
+    (in PLIES_BUCKET half-moves buckets) and number of captures.
+    """
+
+    def __init__(self):
+        self.games = defaultdict(int)
+        self.seconds = defaultdict(float)
+
+    def add(self, plies: int, captures: int, seconds: float):
+        """
+        Record replay time of one game.
+
+        :param plies: number of half-moves in the game
+        :param captures: number of captures in the game
+        :param seconds: replay time
+        """
+        key = f'{plies // PLIES_BUCKET * PLIES_BUCKET}:{captures}'
+        self.games[key] += 1
+        self.seconds[key] += seconds
+
+    def dump(self, profile_dir: Path):
+        """
+        Save histogram to `replay-<pid>.json`.
+
+        :param profile_dir: folder for profiles
+        """
+        outfile = profile_dir.joinpath(f'replay-{os.getpid()}.json')
+        with open(outfile, 'w') as f:
+            json.dump({'games': self.games, 'seconds': self.seconds}, f)
+
+
+def prepare_profile_dir(profile_dir: Path):
+    """
+    Create folder for profiles and remove ones left from a previous run.
+
+    :param profile_dir: folder for profiles
+    """
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    for pattern in ('*.prof', '*.json', '*.txt'):
+        for stale in profile_dir.glob(pattern):
+            stale.unlink()
+
+
+def write_role_reports(profile_dir: Path):
+    """
+    Merge per-process profiles into one profile and one text report
+    per role: `<role>.prof` and `<role>.txt`.
+
+    :param profile_dir: folder with per-process profiles
+    """
+    for role in ROLES:
+        files = sorted(str(p) for p in profile_dir.glob(f'{role}-*.prof'))
+        if not files:
+            continue
+
+        with open(profile_dir.joinpath(f'{role}.txt'), 'w') as f:
+            f.write(f'{role}: {len(files)} process(es)\n')
+            stats = pstats.Stats(*files, stream=f)
+            stats.dump_stats(profile_dir.joinpath(f'{role}.prof'))
+            stats.strip_dirs().sort_stats('cumulative')
+            stats.print_stats(REPORT_LINES)
+            stats.sort_stats('tottime')
+            stats.print_stats(REPORT_LINES)
+
+
+def write_replay_report(profile_dir: Path):
+    """
+    Merge per-process replay-time histograms into `replay-times.txt`,
+    most time-consuming kinds of games first.
+
+    :param profile_dir: folder with per-process histograms
+    """
+    games, seconds = defaultdict(int), defaultdict(float)
+    for file in profile_dir.glob('replay-*.json'):
+        with open(file) as f:
+            data = json.load(f)
+        for k, v in data['games'].items():
+            games[k] += v
+        for k, v in data['seconds'].items():
+            seconds[k] += v
+
+    total = sum(seconds.values())
+    lines = [
+        '|Half-moves|Captures|Games|Time, s|Share|Mean, ms|',
+        '|:----:|:----:|:----:|:----:|:----:|:----:|',
+    ]
+    for key in sorted(seconds, key=seconds.get, reverse=True):
+        plies, captures = map(int, key.split(':'))
+        lines.append(
+            f'|{plies}-{plies + PLIES_BUCKET - 1}'
+            f'|{captures}'
+            f'|{games[key]}'
+            f'|{seconds[key]:.2f}'
+            f'|{seconds[key] / total:.1%}'
+            f'|{seconds[key] / games[key] * 1000:.2f}|'
+        )
+
+    with open(profile_dir.joinpath('replay-times.txt'), 'w') as f:
+        for line in lines:
+            f.write(line + '\n')
+
+
+def write_reports(profile_dir: Path):
+    """
+    Write merged per-role profiles and replay-time histogram.
+
+    :param profile_dir: folder with per-process profiles
+    """
+    write_role_reports(profile_dir)
+    write_replay_report(profile_dir)
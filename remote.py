@@ -0,0 +1,284 @@
+"""
+    remote.py
+    ~~~~
+    Streaming of remote (compressed) PGN dumps over HTTP(S)
+    with resuming of dropped connections and a read-ahead buffer
+"""
+
+import bz2
+import http.client
+import io
+import queue
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from pathlib import PurePosixPath
+from typing import Iterator, Optional, TextIO, Union
+from urllib.parse import unquote, urlparse
+
+# ---- Constants and shared values ----
+# Size of chunks read from the network
+CHUNK_SIZE = 1 << 20
+
+# Default size of the read-ahead buffer, bytes
+READ_AHEAD = 64 * CHUNK_SIZE
+
+# Number of reconnection attempts in a row before giving up
+MAX_RETRIES = 10
+
+# Delay before the first reconnection attempt, seconds;
+# doubles with every failed attempt up to MAX_RETRY_DELAY
+RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 60.0
+
+# Socket timeout, seconds; a stalled connection counts as a dropped one
+TIMEOUT = 60.0
+
+# ---- End of: Constants and shared values ----
+
+
+def is_url(path: str) -> bool:
+    """
+    Check if path is an HTTP(S) URL rather than a local path.
+
+    :param path: path or URL from the command line
+    """
+    return urlparse(path).scheme in ('http', 'https')
+
+
+def url_filename(url: str) -> str:
+    """
+    File name of the remote dump (e.g. lichess_db_2013-01.pgn.bz2).
+
+    :param url: URL of the dump
+    """
+    name = PurePosixPath(unquote(urlparse(url).path)).name
+    if not name:
+        raise RuntimeError(f'No file name in URL: {url}')
+    return name
+
+
+class ResumableResponse(io.RawIOBase):
+    """
+    Body of HTTP response that survives dropped connections.
+    On a network error the request is repeated with
+    `Range: bytes=<position>-`, where position is the number of bytes
+    already read, so reading continues from the same byte.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        retries: int = MAX_RETRIES,
+        retry_delay: float = RETRY_DELAY,
+        timeout: float = TIMEOUT,
+    ):
+        self.url = url
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.position = 0
+        self.length = None
+        self._etag = None
+        # Connection is opened on the first read,
+        # so the initial request is retried the same way as resuming
+        self._response = None
+
+    def _open(self) -> http.client.HTTPResponse:
+        """
+        Request the body starting from the current position.
+        """
+        request = urllib.request.Request(self.url)
+        if self.position:
+            request.add_header('Range', f'bytes={self.position}-')
+            if self._etag:
+                # Server sends the whole (changed) file if ETag differs
+                request.add_header('If-Range', self._etag)
+
+        response = urllib.request.urlopen(request, timeout=self.timeout)
+        if not self.position:
+            self._etag = response.headers.get('ETag')
+            length = response.headers.get('Content-Length')
+            self.length = int(length) if length is not None else None
+            return response
+
+        content_range = response.headers.get('Content-Range', '')
+        if response.status != 206 or not content_range.startswith(
+            f'bytes {self.position}-'
+        ):
+            response.close()
+            raise RuntimeError(f'Server cannot resume download: {self.url}')
+        return response
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        failures = 0
+        while True:
+            try:
+                if self._response is None:
+                    self._response = self._open()
+                n = self._response.readinto(b)
+                if n == 0 and b and self._is_truncated():
+                    raise http.client.IncompleteRead(
+                        b'', self.length - self.position
+                    )
+            except urllib.error.HTTPError as e:
+                # Not a network issue (e.g. 404): nothing to retry
+                if e.code < 500:
+                    raise
+                failures = self._reconnect(failures, e)
+                continue
+            except (OSError, http.client.HTTPException) as e:
+                failures = self._reconnect(failures, e)
+                continue
+
+            self.position += n
+            return n
+
+    def _is_truncated(self) -> bool:
+        """
+        Check if body ended before Content-Length of the first response.
+        """
+        return self.length is not None and self.position < self.length
+
+    def _reconnect(self, failures: int, error: Exception) -> int:
+        """
+        Drop broken connection and wait before the next attempt.
+        Return number of failed attempts in a row.
+
+        :param failures: number of failed attempts so far
+        :param error: error that broke the connection
+        """
+        if failures >= self.retries:
+            raise error
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+        delay = min(self.retry_delay * 2**failures, MAX_RETRY_DELAY)
+        sys.stderr.write(
+            f'Connection lost at byte {self.position:,} ({error!r}), '
+            f'resuming in {delay:.0f}s\n'
+        )
+        time.sleep(delay)
+        return failures + 1
+
+    def close(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+        super().close()
+
+
+class ReadAhead(io.RawIOBase):
+    """
+    Stream that reads chunks from another one in a background thread
+    into a bounded buffer, so network jitter doesn't stall decompression
+    and decompression doesn't stall the download.
+    """
+
+    def __init__(
+        self,
+        raw: io.RawIOBase,
+        size: int = READ_AHEAD,
+        chunk_size: int = CHUNK_SIZE,
+    ):
+        self._raw = raw
+        self._chunk_size = chunk_size
+        self._chunks = queue.Queue(max(1, size // chunk_size))
+        self._current = memoryview(b'')
+        self._eof = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _fill(self):
+        """
+        Read chunks until EOF or error; either one ends the buffer.
+        """
+        try:
+            while not self._stop.is_set():
+                data = self._raw.read(self._chunk_size)
+                if not self._put(data) or not data:
+                    return
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item: Union[bytes, Exception]) -> bool:
+        """
+        Put item into the buffer, waiting while it's full.
+        Return False if the stream was closed meanwhile.
+
+        :param item: chunk of data or error to re-raise in the reader
+        """
+        while not self._stop.is_set():
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if not self._current:
+            if self._eof:
+                return 0
+            item = self._chunks.get()
+            if isinstance(item, Exception):
+                # Filling thread has stopped, nothing more will arrive
+                self._eof = True
+                raise item
+            if not item:
+                self._eof = True
+                return 0
+            self._current = memoryview(item)
+
+        n = min(len(b), len(self._current))
+        b[:n] = self._current[:n]
+        self._current = self._current[n:]
+        return n
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self._raw.close()
+        super().close()
+
+
+@contextmanager
+def open_url(url: str, read_ahead: int = READ_AHEAD) -> Iterator[TextIO]:
+    """
+    Open remote (compressed) PGN for reading in text mode.
+    Data is decompressed as it arrives.
+
+    :param url: URL of (compressed) PGN dump
+    :param read_ahead: size of the read-ahead buffer, bytes
+    """
+    # Check URL suffix to determine how to read the dump
+    suffix = PurePosixPath(url_filename(url)).suffix
+    if suffix not in ('.bz2', '.pgn'):
+        raise RuntimeError(f'Unsupported extension: {suffix}')
+
+    raw = ReadAhead(ResumableResponse(url), read_ahead)
+    stream: Optional[TextIO] = None
+    try:
+        if suffix == '.bz2':
+            stream = bz2.open(raw, 'rt', encoding='latin-1')
+        else:
+            stream = io.TextIOWrapper(
+                io.BufferedReader(raw, CHUNK_SIZE), encoding='latin-1'
+            )
+        yield stream
+    finally:
+        if stream is not None:
+            stream.close()
+        # Compressed stream doesn't close the file object it was given
+        raw.close()
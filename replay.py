@@ -0,0 +1,374 @@
+"""
+    replay.py
+    ~~~~
+    Lightweight non-validating replay engine for clean games
+    and tool to validate it against python-chess
+"""
+
+import re
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# ---- Constants and shared values ----
+SAN_REGEX = re.compile(
+    r'^([NBKRQ])?([a-h])?([1-8])?([\-x])?([a-h][1-8])(=?[NBRQ])?[+#]?$'
+)
+
+CASTLING = {
+    # SAN: (king from, king to, rook from, rook to) for White;
+    # Black squares are the same + 56
+    'O-O': (4, 6, 7, 5),
+    'O-O-O': (4, 2, 0, 3),
+    '0-0': (4, 6, 7, 5),
+    '0-0-0': (4, 2, 0, 3),
+}
+
+# Starting position, a1 = 0, h8 = 63
+INITIAL_BOARD = [*'RNBQKBNR', *'P' * 8, *[None] * 32, *'p' * 8, *'rnbqkbnr']
+
+ROOK_DIRECTIONS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+KNIGHT_JUMPS = (
+    (1, 2),
+    (2, 1),
+    (2, -1),
+    (1, -2),
+    (-1, -2),
+    (-2, -1),
+    (-2, 1),
+    (-1, 2),
+)
+
+
+def _targets(square: int, steps) -> List[int]:
+    file, rank = square % 8, square // 8
+    return [
+        (rank + dr) * 8 + file + df
+        for df, dr in steps
+        if 0 <= file + df < 8 and 0 <= rank + dr < 8
+    ]
+
+
+def _rays(square: int, directions) -> List[List[int]]:
+    rays = []
+    for df, dr in directions:
+        ray, file, rank = [], square % 8 + df, square // 8 + dr
+        while 0 <= file < 8 and 0 <= rank < 8:
+            ray.append(rank * 8 + file)
+            file, rank = file + df, rank + dr
+        rays.append(ray)
+    return rays
+
+
+# Attack lookups: squares a piece on a given square can come from
+KNIGHT_ATTACKS = [_targets(sq, KNIGHT_JUMPS) for sq in range(64)]
+KING_ATTACKS = [
+    _targets(sq, ROOK_DIRECTIONS + BISHOP_DIRECTIONS) for sq in range(64)
+]
+ROOK_RAYS = [_rays(sq, ROOK_DIRECTIONS) for sq in range(64)]
+BISHOP_RAYS = [_rays(sq, BISHOP_DIRECTIONS) for sq in range(64)]
+QUEEN_RAYS = [ROOK_RAYS[sq] + BISHOP_RAYS[sq] for sq in range(64)]
+SLIDER_RAYS = {'R': ROOK_RAYS, 'B': BISHOP_RAYS, 'Q': QUEEN_RAYS}
+
+# ---- End of: Constants and shared values ----
+
+
+class FallbackNeeded(ValueError):
+    """
+    Move can't be resolved without full move generation;
+    game has to be replayed by python-chess.
+    """
+
+
+# ---- Move resolution ----
+def square_index(name: str) -> int:
+    """
+    Square index from its name (e.g. e4 -> 28).
+
+    :param name: square name
+    """
+    return (ord(name[1]) - ord('1')) * 8 + ord(name[0]) - ord('a')
+
+
+def piece_sources(board: list, piece: str, to_sq: int) -> List[int]:
+    """
+    Find squares with `piece` that attack `to_sq` (pseudo-legally).
+
+    :param board: 64-square mailbox
+    :param piece: FEN symbol of the piece that moves
+    :param to_sq: destination square
+    """
+    kind = piece.upper()
+    if kind == 'N':
+        return [sq for sq in KNIGHT_ATTACKS[to_sq] if board[sq] == piece]
+    if kind == 'K':
+        return [sq for sq in KING_ATTACKS[to_sq] if board[sq] == piece]
+
+    sources = []
+    for ray in SLIDER_RAYS[kind][to_sq]:
+        for sq in ray:
+            if board[sq] is None:
+                continue
+            if board[sq] == piece:
+                sources.append(sq)
+            # Any piece blocks the ray
+            break
+    return sources
+
+
+def matches_disambiguation(
+    square: int, from_file: Optional[str], from_rank: Optional[str]
+) -> bool:
+    """
+    Check if square agrees with SAN disambiguation (e.g. `b` in Nbd7).
+
+    :param square: source square candidate
+    :param from_file: file given in SAN or None
+    :param from_rank: rank given in SAN or None
+    """
+    if from_file is not None and square % 8 != ord(from_file) - ord('a'):
+        return False
+    return from_rank is None or square // 8 == int(from_rank) - 1
+
+
+def play_castling(board: list, san: str, white: bool):
+    """
+    Castle on the mailbox.
+
+    :param board: 64-square mailbox
+    :param san: castling SAN without check suffix
+    :param white: White to move
+    """
+    offset = 0 if white else 56
+    king_from, king_to, rook_from, rook_to = (
+        sq + offset for sq in CASTLING[san]
+    )
+    king, rook = ('K', 'R') if white else ('k', 'r')
+    if board[king_from] != king or board[rook_from] != rook:
+        raise FallbackNeeded(san)
+    board[king_from] = board[rook_from] = None
+    board[king_to], board[rook_to] = king, rook
+
+
+def play_pawn(
+    board: list, match, white: bool, ep: Optional[int]
+) -> Tuple[bool, Optional[int]]:
+    """
+    Play pawn move on the mailbox.
+    Return whether a piece was captured and new en passant square.
+
+    :param board: 64-square mailbox
+    :param match: SAN regex match
+    :param white: White to move
+    :param ep: current en passant square
+    """
+    _, from_file, from_rank, capture, to, promotion = match.groups()
+    to_sq = square_index(to)
+    step = 8 if white else -8
+    pawn = 'P' if white else 'p'
+    last_rank = to[1] == ('8' if white else '1')
+    if from_rank or bool(promotion) != last_rank:
+        raise FallbackNeeded(match.string)
+
+    new_ep, captured = None, True
+    if from_file is None:
+        if capture:
+            raise FallbackNeeded(match.string)
+        # Push: single or double
+        from_sq = to_sq - step
+        if board[from_sq] is None and to[1] == ('4' if white else '5'):
+            new_ep, from_sq = from_sq, from_sq - step
+        if board[from_sq] != pawn or board[to_sq] is not None:
+            raise FallbackNeeded(match.string)
+        captured = False
+    else:
+        from_sq = square_index(from_file + to[1]) - step
+        if board[from_sq] != pawn or abs(from_sq % 8 - to_sq % 8) != 1:
+            raise FallbackNeeded(match.string)
+        if to_sq == ep and board[to_sq] is None:
+            # En passant: captured pawn is behind the destination
+            board[to_sq - step] = None
+        elif not is_enemy(board[to_sq], white):
+            raise FallbackNeeded(match.string)
+
+    board[from_sq] = None
+    if promotion:
+        symbol = promotion[-1]
+        board[to_sq] = symbol if white else symbol.lower()
+    else:
+        board[to_sq] = pawn
+    return captured, new_ep
+
+
+def is_enemy(symbol: Optional[str], white: bool) -> bool:
+    """
+    Check if square holds a piece of the side not to move.
+
+    :param symbol: FEN symbol or None for empty square
+    :param white: White to move
+    """
+    return symbol is not None and symbol.isupper() != white
+
+
+def play_san(
+    board: list, san: str, white: bool, ep: Optional[int]
+) -> Tuple[bool, Optional[int]]:
+    """
+    Play SAN move on the mailbox.
+    Return whether a piece was captured and new en passant square.
+    Raise FallbackNeeded if the move can't be resolved unambiguously
+    with pseudo-legal attack lookups.
+
+    :param board: 64-square mailbox
+    :param san: move in SAN
+    :param white: White to move
+    :param ep: current en passant square
+    """
+    castling = san.rstrip('+#')
+    if castling in CASTLING:
+        play_castling(board, castling, white)
+        return False, None
+
+    match = SAN_REGEX.match(san)
+    if match is None:
+        raise FallbackNeeded(san)
+    if match.group(1) is None:
+        return play_pawn(board, match, white, ep)
+
+    kind, from_file, from_rank, capture, to, promotion = match.groups()
+    to_sq = square_index(to)
+    target = board[to_sq]
+    if promotion or bool(capture == 'x') != (target is not None):
+        raise FallbackNeeded(san)
+    if target is not None and not is_enemy(target, white):
+        raise FallbackNeeded(san)
+
+    piece = kind if white else kind.lower()
+    sources = [
+        sq
+        for sq in piece_sources(board, piece, to_sq)
+        if matches_disambiguation(sq, from_file, from_rank)
+    ]
+    if len(sources) != 1:
+        # Either illegal or ambiguous between a pinned and a free piece
+        raise FallbackNeeded(san)
+
+    board[sources[0]] = None
+    board[to_sq] = piece
+    return target is not None, None
+
+
+# ---- End of: Move resolution ----
+
+
+def reach_position(
+    moves: List[str], captures: int
+) -> Optional[Tuple[Dict[int, str], bool]]:
+    """
+    Replay mainline to the position after `captures` number of captures
+    (see `egtb.chess_reach_position` for the rules).
+    Return pieces by square and side to move if position is suitable.
+    Moves after that position aren't played, nor validated.
+
+    :param moves: mainline SAN moves from the initial position
+    :param captures: number of captures to reach
+    """
+    board = list(INITIAL_BOARD)
+    white, ep = True, None
+    pieces, target = 32, 32 - captures
+    reached = None
+
+    for ply, san in enumerate(moves, start=1):
+        captured, ep = play_san(board, san, white, ep)
+        white = not white
+        pieces -= captured
+
+        if reached is not None:
+            # Half-move after the reached position
+            return None if pieces < target else reached
+
+        if ply >= captures + 2 and pieces == target:
+            reached = (
+                {sq: p for sq, p in enumerate(board) if p is not None},
+                white,
+            )
+
+    # Position never reached or it's the last one in the game
+    return None
+
+
+def validate(filepath: Path, captures: int) -> int:
+    """
+    Replay all games in PGN file with both engines and compare results.
+    Return number of mismatches.
+
+    :param filepath: path to PGN file
+    :param captures: number of captures to reach
+    """
+    # Imported here: egtb uses this module
+    import egtb
+
+    games = []
+    with open(filepath, encoding='latin-1') as f:
+        while True:
+            try:
+                games.append(egtb.next_pgn(f))
+            except StopIteration:
+                break
+
+    def run(fast: bool) -> Tuple[list, float]:
+        started = time.perf_counter()
+        results = []
+        for pgn in games:
+            board = egtb.reach_position(pgn, captures, fast=fast)
+            results.append(
+                None
+                if board is None
+                else (board.board_fen(), board.turn)
+            )
+        return results, time.perf_counter() - started
+
+    reference, reference_time = run(fast=False)
+    fast, fast_time = run(fast=True)
+
+    fallbacks = 0
+    for pgn in games:
+        try:
+            reach_position(egtb.mainline_san(pgn[-1]), captures)
+        except ValueError:
+            fallbacks += 1
+
+    mismatches = [
+        i for i, (a, b) in enumerate(zip(reference, fast)) if a != b
+    ]
+    total = len(games)
+    print(f'Games: {total:,}; handed to python-chess: {fallbacks:,}')
+    print(f'python-chess: {total / reference_time:,.0f} games/sec')
+    print(f'fast replay: {total / fast_time:,.0f} games/sec')
+    print(f'Mismatches: {len(mismatches):,}')
+    for i in mismatches[:10]:
+        print(f'    game #{i + 1}: {reference[i]} vs {fast[i]}')
+
+    return len(mismatches)
+
+
+def main():
+    ap = ArgumentParser()
+    ap.add_argument('path', type=Path, help='PGN file to validate on')
+    ap.add_argument(
+        '--captures',
+        type=int,
+        default=25,
+        help='Number of captures to reach desired positions. Default: 25',
+    )
+    args = ap.parse_args()
+
+    mismatches = validate(args.path, args.captures)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""
+    rollup.py
+    ~~~~
+    Statistics bucketed by game month for date-range queries
+    and tool to build and query them
+"""
+
+import json
+import re
+from argparse import ArgumentParser, ArgumentTypeError
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from datetime import datetime as dt
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from updatestats import material_diff_sort
+
+# ---- Constants and shared values ----
+# Counters kept per month, same as in `.stats.json` files
+SECTIONS = ('timecontrol', 'EGTB')
+
+MONTH_REGEX = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+YEAR_REGEX = re.compile(r'^\d{4}$')
+
+# ---- End of: Constants and shared values ----
+
+
+def month_arg(value: str) -> str:
+    """
+    Validate month (YYYY-MM) given on the command line.
+
+    :param value: argument value
+    """
+    if not MONTH_REGEX.match(value):
+        raise ArgumentTypeError(f'expected YYYY-MM, got {value!r}')
+    return value
+
+
+def year_arg(value: str) -> str:
+    """
+    Validate year (YYYY) given on the command line.
+
+    :param value: argument value
+    """
+    if not YEAR_REGEX.match(value):
+        raise ArgumentTypeError(f'expected YYYY, got {value!r}')
+    return value
+
+
+def empty_bucket() -> Dict[str, Dict[str, int]]:
+    """
+    Counters for one month or year.
+    """
+    return {section: defaultdict(int) for section in SECTIONS}
+
+
+def cumulative_stats(
+    timecontrol: Dict[str, int], egtb: Dict[str, int]
+) -> dict:
+    """
+    Statistics in the layout of cumulative stats files
+    (see `updatestats.combine`), so tables can be generated from them.
+
+    :param timecontrol: number of games per time control
+    :param egtb: number of games per EGTB
+    """
+    return {
+        'created': dt.isoformat(dt.now()),
+        'total_games': sum(timecontrol.values()),
+        'timecontrol': dict(timecontrol),
+        'EGTB_material_diff': material_diff_sort(egtb),
+        'EGTB_most_games': dict(Counter(egtb).most_common()),
+    }
+
+
+class Rollup:
+    """
+    Game counts by month (YYYY-MM) with precomputed per-year totals
+    and prefix sums over months.
+
+    `prefix[section][key][i]` is the number of games with `key`
+    played in `months[0]`..`months[i]`, so counts for any range of months
+    are the difference of two prefix sums, regardless of its length.
+    """
+
+    def __init__(
+        self,
+        months: List[str],
+        years: Dict[str, dict],
+        prefix: Dict[str, Dict[str, List[int]]],
+    ):
+        self.months = months
+        self.years = years
+        self.prefix = prefix
+
+    @classmethod
+    def from_buckets(cls, buckets: Dict[str, dict]) -> 'Rollup':
+        """
+        Build rollup from per-month counts.
+
+        :param buckets: month to {section: {key: count}}
+        """
+        months = sorted(buckets)
+
+        years = defaultdict(empty_bucket)
+        for month in months:
+            for section in SECTIONS:
+                for k, v in buckets[month][section].items():
+                    years[month[:4]][section][k] += v
+
+        prefix = {}
+        for section in SECTIONS:
+            keys = {k for month in months for k in buckets[month][section]}
+            prefix[section] = {
+                k: list(
+                    accumulate(
+                        buckets[month][section].get(k, 0) for month in months
+                    )
+                )
+                for k in sorted(keys)
+            }
+
+        years = {
+            year: {section: dict(counts) for section, counts in data.items()}
+            for year, data in sorted(years.items())
+        }
+        return cls(months, years, prefix)
+
+    @classmethod
+    def from_stats_files(cls, files: Iterable[Path]) -> 'Rollup':
+        """
+        Build rollup from monthly buckets of `.stats.json` files.
+        Games with unknown date aren't part of any bucket.
+
+        :param files: `.stats.json` files
+        """
+        buckets = defaultdict(empty_bucket)
+        for file in files:
+            with open(file) as f:
+                data = json.load(f)
+            for month, stats in data.get('months', {}).items():
+                for section in SECTIONS:
+                    for k, v in stats[section].items():
+                        buckets[month][section][k] += v
+
+        return cls.from_buckets(buckets)
+
+    @classmethod
+    def load(cls, path: Path) -> 'Rollup':
+        """
+        Load rollup saved by `save`.
+
+        :param path: rollup file
+        """
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['months'], data['years'], data['prefix'])
+
+    def save(self, path: Path):
+        """
+        Save rollup to JSON.
+
+        :param path: rollup file
+        """
+        data = {
+            'created': dt.isoformat(dt.now()),
+            'months': self.months,
+            'years': self.years,
+            'prefix': self.prefix,
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+    def query(
+        self, since: Optional[str] = None, until: Optional[str] = None
+    ) -> dict:
+        """
+        Statistics for games played from `since` to `until` month
+        (both inclusive, YYYY-MM) in the layout of cumulative stats files.
+
+        :param since: first month; default: the earliest one
+        :param until: last month; default: the latest one
+        """
+        lo = bisect_left(self.months, since) if since else 0
+        hi = bisect_right(self.months, until) if until else len(self.months)
+
+        counts = {}
+        for section in SECTIONS:
+            counts[section] = {}
+            if lo >= hi:
+                continue
+            for k, sums in self.prefix[section].items():
+                cnt = sums[hi - 1] - (sums[lo - 1] if lo else 0)
+                if cnt:
+                    counts[section][k] = cnt
+
+        return cumulative_stats(counts['timecontrol'], counts['EGTB'])
+
+    def year(self, year: str) -> dict:
+        """
+        Statistics for games played in `year` (YYYY)
+        in the layout of cumulative stats files.
+
+        :param year: year to get statistics for
+        """
+        data = self.years.get(year, empty_bucket())
+        return cumulative_stats(data['timecontrol'], data['EGTB'])
+
+    def share_by_year(self, egtb: str) -> Dict[str, float]:
+        """
+        Share of games that reached `egtb` in every year, percent.
+
+        :param egtb: EGTB name
+        """
+        shares = {}
+        for year, data in self.years.items():
+            total = sum(data['timecontrol'].values())
+            shares[year] = data['EGTB'].get(egtb, 0) / total * 100
+        return shares
+
+
+def main():
+    ap = ArgumentParser()
+    commands = ap.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser(
+        'build', help='Build rollup from .stats.json files'
+    )
+    build.add_argument(
+        'files', nargs='+', type=Path, help='.stats.json files to combine'
+    )
+    build.add_argument(
+        '--outfile',
+        type=Path,
+        default=Path.cwd().joinpath('rollup.json'),
+        help='Output file',
+    )
+
+    query = commands.add_parser(
+        'query', help='Get statistics for a range of months'
+    )
+    query.add_argument('rollup', type=Path, help='Rollup file')
+    query.add_argument(
+        '--since',
+        type=month_arg,
+        help='First month (YYYY-MM). Default: the earliest one',
+    )
+    query.add_argument(
+        '--until',
+        type=month_arg,
+        help='Last month (YYYY-MM). Default: the latest one',
+    )
+    query.add_argument(
+        '--year',
+        type=year_arg,
+        help='Get statistics for a whole year (YYYY) instead of months',
+    )
+    query.add_argument(
+        '--egtb',
+        help='Instead, show share of games that reached EGTB by year',
+    )
+    query.add_argument(
+        '--outfile',
+        type=Path,
+        default=Path.cwd().joinpath('cumulative.json'),
+        help='Output file',
+    )
+
+    args = ap.parse_args()
+
+    if args.command == 'build':
+        Rollup.from_stats_files(args.files).save(args.outfile)
+        return
+
+    if args.year and (args.since or args.until):
+        query.error('--year cannot be combined with --since/--until')
+
+    rollup = Rollup.load(args.rollup)
+    if args.egtb:
+        for year, share in rollup.share_by_year(args.egtb).items():
+            print(f'{year}: {share:.2f}%')
+        return
+
+    if args.year:
+        stats = rollup.year(args.year)
+    else:
+        stats = rollup.query(args.since, args.until)
+    with open(args.outfile, 'w') as f:
+        json.dump(stats, f)
+    print(f'{stats["total_games"]:,} games')
+
+
+if __name__ == '__main__':
+    main()